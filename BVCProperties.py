@@ -1,9 +1,26 @@
 import bpy
 from .util import *
+from .command_security import DEFAULT_ALLOWED_IMPORTS
 #from .OperatorTool import *
 class Device_Name(bpy.types.PropertyGroup):
     device_name: bpy.props.StringProperty(name="Device_Name：デバイス名")
 
+######################################
+#  推論設定が変わった瞬間の処理
+######################################
+def model_config_update(self, context):
+    """計算精度・スレッド数の変更をモデル管理に反映"""
+    from .model_registry import model_registry
+    model_registry.configure(self.compute_type, self.cpu_threads)
+    publish_recognition_config()
+
+######################################
+#  録音・推論スレッドが参照する設定の更新
+######################################
+def recognition_config_update(self, context):
+    """閾値・デバイス・言語の変更を設定スナップショットとして公開"""
+    publish_recognition_config()
+
 ######################################
 #  　 　　デバイスプロパティ　     
 ######################################
@@ -14,12 +31,100 @@ class BVC_Device_Properties(bpy.types.PropertyGroup):
         description="Volume level",
         default=0.5,
         min=0.0,
-        max=1.0
+        max=1.0,
+        update=recognition_config_update
     )
 
     #デバイス名のリスト と 選択されたデバイス名
     device_list:bpy.props.CollectionProperty(type=Device_Name)
-    selected_device:bpy.props.StringProperty(name="選択されたデバイス",default="未選択")
+    selected_device:bpy.props.StringProperty(name="選択されたデバイス",default="未選択",update=recognition_config_update)
+
+    #推論の計算精度（int8系は量子化により推論時間・メモリを削減）
+    compute_type:bpy.props.EnumProperty(
+        name="計算精度",
+        description="faster-whisperの計算精度",
+        items=[
+            ('AUTO', "自動", "自動計測の結果を使用（未計測ならint8）"),
+            ('int8', "int8", "重み・演算ともint8（最速・省メモリ）"),
+            ('int8_float32', "int8_float32", "重みはint8、演算はfloat32"),
+            ('float32', "float32", "量子化なし（最も遅い）"),
+        ],
+        default='AUTO',
+        update=model_config_update
+    )
+    #認識区間の切り出し方
+    segmentation_mode:bpy.props.EnumProperty(
+        name="区間の切り出し",
+        description="認識に渡す音声区間の切り出し方",
+        items=[
+            ('FIXED', "固定長(2秒)", "約2秒ごとに区切って認識"),
+            ('ENDPOINT', "発話の終わり", "発話の開始から一定時間の無音までを1区間として認識"),
+        ],
+        default='ENDPOINT'
+    )
+    endpoint_silence_ms:bpy.props.IntProperty(
+        name="発話終了とみなす無音(ms)",
+        description="この時間だけ無音が続いたら発話の終わりとみなします",
+        default=400,
+        min=100,
+        max=2000
+    )
+    pre_roll_ms:bpy.props.IntProperty(
+        name="プリロール(ms)",
+        description="発話開始を検出した位置より前に含める長さ。語頭の子音が欠ける場合は長くしてください",
+        default=300,
+        min=0,
+        max=1000
+    )
+    min_speech_ms:bpy.props.IntProperty(
+        name="最小音声長(ms)",
+        description="前後の無音を除いた音声がこれより短い区間は認識しません",
+        default=200,
+        min=0,
+        max=2000
+    )
+    max_segment_seconds:bpy.props.FloatProperty(
+        name="最大区間長(秒)",
+        description="1区間の最大長。これを超える発話は区切って認識します",
+        default=8.0,
+        min=1.0,
+        max=9.0
+    )
+
+    #録音スレッドから推論スレッドへ渡す区間の上限と、溢れたときの扱い
+    window_queue_size:bpy.props.IntProperty(
+        name="推論待ちの上限",
+        description="推論待ちにできる音声区間の数",
+        default=2,
+        min=1,
+        max=16
+    )
+    window_queue_policy:bpy.props.EnumProperty(
+        name="推論待ちが溢れたとき",
+        description="推論が追いつかず推論待ちが上限に達したときの扱い",
+        items=[
+            ('DROP_OLDEST', "古い区間を破棄", "最も古い区間を捨てて最新の区間を優先"),
+            ('DROP_NEWEST', "新しい区間を破棄", "推論待ちの区間を優先し、新しい区間を捨てる"),
+            ('COALESCE', "区間を結合", "最後の推論待ち区間に結合してまとめて認識"),
+            ('BLOCK', "待機", "空きが出るまで区間の切り出しを待つ"),
+        ],
+        default='DROP_OLDEST'
+    )
+    cpu_threads:bpy.props.IntProperty(
+        name="CPUスレッド数",
+        description="推論に使用するCPUスレッド数",
+        default=4,
+        min=1,
+        max=32,
+        update=model_config_update
+    )
+
+    #録音経路のデバッグログ（別スレッドで1秒ごとに計測値を出力）
+    debug_audio_log:bpy.props.BoolProperty(
+        name="録音のデバッグログ",
+        description="録音中のブロック数・入力の溢れ・ピークなどを1秒ごとにコンソールへ出力します（次回の録音開始から有効）",
+        default=False
+    )
 
 
 ######################################
@@ -40,14 +145,29 @@ class BVC_Mode_Properties(bpy.types.PropertyGroup):
         default='UNSET'
     )
 
+    # アドオン登録直後に音声認識モデルをバックグラウンドで読み込むか
+    preload_model: bpy.props.BoolProperty(
+        name="モデルを事前読み込み",
+        description="アドオン登録直後に音声認識モデルをバックグラウンドで読み込みます（無効時は初回の認識開始時に読み込み）",
+        default=False
+    )
+
 ######################################
 #  　 　　コマンドリスト要素プロパティ　     
 ######################################
+def command_code_update(self, context):
+    """コードが編集された時点でコンパイル・検査し、構文エラーやポリシー違反を知らせる"""
+    from .command_security import check_command_code, policy_from_props
+    _, error = check_command_code(self.code, policy_from_props(context.scene.bvc_command_props))
+    if error:
+        print(f"コマンド '{self.name}' のコードに{error}")
+
 # リスト要素
 class CommandItem(bpy.types.PropertyGroup):
     name: bpy.props.StringProperty(name="コマンド名")
     description: bpy.props.StringProperty(name="処理内容の説明")
-    code: bpy.props.StringProperty(name="処理コード")
+    code: bpy.props.StringProperty(name="処理コード", update=command_code_update)
+    priority: bpy.props.IntProperty(name="優先度", description="同じ長さのキーが重なって一致したときに優先する順（大きいほど優先）", default=0)
 ######################################
 #  　 　　言語別コマンドのプロパティ　     
 ##########################################
@@ -65,6 +185,11 @@ class Voice_Command_Item(bpy.types.PropertyGroup):
         name="コマンドコード",
         description="音声コマンドのコード（例：save_command、delete_command）"
     )
+    command_priority : bpy.props.IntProperty(
+        name="コマンドの優先度",
+        description="同じ長さのキーが重なって一致したときの優先度（command.jsonのpriority）",
+        default=0
+    )
 ######################################
 #  　 　　言語別コマンドのプロパティ　     
 ######################################
@@ -118,6 +243,54 @@ class BVC_Command_Properties(bpy.types.PropertyGroup):
         default="未選択"
     )
     
+    # 完全一致しないときのあいまい照合（キーの長さに対して許す編集距離の割合、0で無効）
+    fuzzy_match_ratio : bpy.props.FloatProperty(
+        name="あいまい照合",
+        description="認識結果がコマンドと完全に一致しないとき、キーの長さに対してこの割合までの誤りを許して照合します（0で無効）",
+        default=0.25,
+        min=0.0,
+        max=0.5
+    )
+    fuzzy_min_confidence : bpy.props.FloatProperty(
+        name="あいまい照合の信頼度",
+        description="あいまい照合で実行するのは、一致した割合（1 - 誤り / キーの長さ）がこの値以上のコマンドのみです",
+        default=0.8,
+        min=0.0,
+        max=1.0
+    )
+    
+    # キー・あいまい照合でも見つからないときの説明文による照合（類似度の下限、0で無効）
+    description_match_threshold : bpy.props.FloatProperty(
+        name="説明文で照合",
+        description="コマンドのキーで見つからないとき、キーと説明文との類似度がこの値以上で、他のコマンドより明らかに近いコマンドを実行します（0で無効）",
+        default=0.0,
+        min=0.0,
+        max=1.0
+    )
+    
+    # コマンドのコードの検査ポリシー（音声・ポップアップの両方の実行に適用）
+    code_policy : bpy.props.EnumProperty(
+        name="コードの検査",
+        description="コマンドのコードを実行する前の安全性チェック",
+        items=[
+            ('STANDARD', "標準", "許可したモジュール以外のimport、exec・openなどの呼び出し、「_」で始まる属性へのアクセスを禁止"),
+            ('TRUSTED', "信頼済み", "構文チェックのみ（自分で書いたコマンドだけを使う場合）"),
+        ],
+        default='STANDARD'
+    )
+    allowed_imports : bpy.props.StringProperty(
+        name="許可するモジュール",
+        description="コマンドのコードでimportを許可するモジュール（カンマ区切り）",
+        default=DEFAULT_ALLOWED_IMPORTS
+    )
+    
+    # まとめて処理した音声コマンドの「元に戻す」の単位
+    batch_undo : bpy.props.BoolProperty(
+        name="まとめて元に戻す",
+        description="同じタイミングで処理した複数の音声コマンドを、1回の「元に戻す」で取り消せるようにします（オフのときはコマンドごと）",
+        default=True
+    )
+    
     # JSONファイルパス
     json_file_path : bpy.props.StringProperty(
         name="JSONファイルパス",
@@ -147,6 +320,9 @@ def ja_checkbox_update(self, context):
         finally:
             if hasattr(self, '_updating'):
                 delattr(self, '_updating')
+    
+    # 認識言語の変更を推論スレッドへ反映
+    publish_recognition_config()
 
 def en_checkbox_update(self, context):
     """英語チェックボックスが押された時"""
@@ -167,6 +343,9 @@ def en_checkbox_update(self, context):
         finally:
             if hasattr(self, '_updating'):
                 delattr(self, '_updating')
+    
+    # 認識言語の変更を推論スレッドへ反映
+    publish_recognition_config()
 
 def zh_checkbox_update(self, context):
     """中文チェックボックスが押された時"""
@@ -187,6 +366,9 @@ def zh_checkbox_update(self, context):
         finally:
             if hasattr(self, '_updating'):
                 delattr(self, '_updating')
+    
+    # 認識言語の変更を推論スレッドへ反映
+    publish_recognition_config()
 
 ######################################
 #  　 　　言語プロパティ　     
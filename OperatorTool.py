@@ -7,9 +7,53 @@ from .util import *
 #   　 　　Modal音声認識オペレーター（pywhispercpp対応）
 ###########################################
 
+import time
+
 import bpy
 from bpy.types import Operator
-from .util import get_pywhisper_streaming_manager
+from .util import get_pywhisper_streaming_manager, RESULT_DISPATCH_BUDGET
+from .adaptive_timer import AdaptiveTimer
+
+
+def tag_sidebar_redraw(window_manager):
+    """3Dビューのサイドバー（パネルのある領域）だけを再描画対象にする（ビューポート全体は描き直さない）"""
+    for window in window_manager.windows:
+        for area in window.screen.areas:
+            if area.type != 'VIEW_3D':
+                continue
+            for region in area.regions:
+                if region.type == 'UI':
+                    region.tag_redraw()
+
+
+def find_command_override(window_manager, window=None, area=None):
+    """コマンドを実行するウィンドウ・3Dビュー・領域（temp_overrideに渡す辞書。見つからなければ空）
+
+    タイマーから呼ばれる処理にはウィンドウや領域がないため、bpy.ops.object.deleteなど
+    3Dビューを前提とする演算子はこの辞書でコンテキストを補ってから実行する。
+    """
+    windows = [window] if window is not None else list(window_manager.windows)
+    for window in windows:
+        areas = [area] if area is not None and area.type == 'VIEW_3D' else list(window.screen.areas)
+        for candidate in areas:
+            if candidate.type != 'VIEW_3D':
+                continue
+            for region in candidate.regions:
+                if region.type == 'WINDOW':
+                    return {"window": window, "area": candidate, "region": region}
+    return {}
+
+
+def is_override_valid(window_manager, override):
+    """保存したウィンドウ・エリア・領域がまだ開いているか"""
+    try:
+        window = override["window"]
+        area = override["area"]
+        return (window in list(window_manager.windows)
+                and area in list(window.screen.areas)
+                and override["region"] in list(area.regions))
+    except (KeyError, ReferenceError):
+        return False
 
 
 class VOICE_OT_bvc_mode(Operator):
@@ -19,9 +63,11 @@ class VOICE_OT_bvc_mode(Operator):
     bl_options = {'REGISTER','UNDO'}
 
     def __init__(self):
-        self._timer = None
+        self._timer = None  # 認識結果を確認するAdaptiveTimer
         self.is_voice_active = False
         self.use_pywhisper = True  # pywhispercpp優先使用
+        self._drawn_version = None  # 前回再描画したときの状態のバージョン
+        self._override = {}  # コマンドを実行するウィンドウ・エリア・領域
 
     @classmethod
     def poll(cls, context):
@@ -61,9 +107,13 @@ class VOICE_OT_bvc_mode(Operator):
             print(f"{engine_name}で音声認識を開始しようとしています...")
             
             if voice_mgr.start_recognition():
-                # タイマーを設定（0.2秒間隔でチェック）
+                # 認識結果の確認はbpy.app.timersで行う（結果待ちの間だけ短い間隔、何もなければ間隔を延ばす）
+                # Modalハンドラーは停止（ESC）の受け付けに使う
                 wm = context.window_manager
-                self._timer = wm.event_timer_add(0.2, window=context.window)
+                # タイマーの中でも開始したときの3Dビューでコマンドを実行できるように記録しておく
+                self._override = find_command_override(wm, context.window, context.area)
+                self._timer = AdaptiveTimer(self.on_timer)
+                self._timer.start()
                 wm.modal_handler_add(self)
                 
                 self.is_voice_active = True
@@ -80,10 +130,8 @@ class VOICE_OT_bvc_mode(Operator):
             voice_mgr.stop_recognition()
             self.report({'INFO'}, f"🎤 {engine_name}音声認識を停止しました")
             
-            # UIの更新を強制
-            for area in context.screen.areas:
-                if area.type == 'VIEW_3D':
-                    area.tag_redraw()
+            # パネルの表示を更新
+            tag_sidebar_redraw(context.window_manager)
             
             return {'FINISHED'}
     
@@ -93,26 +141,12 @@ class VOICE_OT_bvc_mode(Operator):
         
         voice_mgr = voice_manager  # 標準のvoice_managerを使用
         
-        if event.type == 'TIMER':
-            # 定期的な音声結果チェック
-            result = voice_mgr.get_latest_result()
-            if result:
-                engine_name = "pywhispercpp" if self.use_pywhisper else "faster-whisper"
-                
-                if "error" in result:
-                    self.report({'ERROR'}, f"音声認識エラー: {result['error']}")
-                    self.cleanup(context)
-                    return {'CANCELLED'}
-                else:
-                    # 音声コマンドを処理
-                    self.process_voice_command(result, context)
-            
-            # UIの更新を強制（パネルの状態表示更新）
-            for area in context.screen.areas:
-                if area.type == 'VIEW_3D':
-                    area.tag_redraw()
+        if not voice_mgr.is_active:
+            # 認識エラーまたはパネルのボタンで停止された
+            self.cleanup(context)
+            return {'CANCELLED'}
         
-        elif event.type == 'ESC':
+        if event.type == 'ESC':
             # ESCキーで停止
             engine_name = "pywhispercpp" if self.use_pywhisper else "faster-whisper"
             self.report({'INFO'}, f"{engine_name}音声認識を停止しました")
@@ -122,15 +156,102 @@ class VOICE_OT_bvc_mode(Operator):
         # 他の全てのイベントはBlenderの標準処理に渡す
         return {'PASS_THROUGH'}
     
+    def on_timer(self):
+        """認識結果の確認（AdaptiveTimerから呼ばれる。戻り値: 結果待ちならTrue、停止するならNone）"""
+        from .util import voice_manager
+        
+        voice_mgr = voice_manager  # 標準のvoice_managerを使用
+        if not voice_mgr.is_active:
+            return None
+        context = bpy.context
+        voice_mgr.dispatch_metrics.record_wakeup(self._timer.interval)
+        
+        # 開始時の3Dビューが閉じられていたら、開いている3Dビューを探し直す
+        if not is_override_valid(context.window_manager, self._override):
+            self._override = find_command_override(context.window_manager)
+        
+        # 溜まっている認識結果を時間の上限までまとめて処理（3Dビューのコンテキストで実行）
+        voice_mgr.result_ready.clear()
+        with context.temp_override(**self._override):
+            dispatched = self.dispatch_results(bpy.context, voice_mgr)
+        if dispatched is None:
+            # 認識エラー（Modalハンドラーは次のイベントで終了する）
+            voice_mgr.stop_recognition()
+            tag_sidebar_redraw(context.window_manager)
+            return None
+        
+        # 状態（状態メッセージ・レベルメーターの段階・経過秒・認識結果）が変わったときだけパネルを再描画
+        version = voice_mgr.refresh_status()
+        if version != self._drawn_version:
+            self._drawn_version = version
+            tag_sidebar_redraw(context.window_manager)
+        
+        return bool(dispatched) or voice_mgr.has_pending_work()
+    
+    def dispatch_results(self, context, voice_mgr):
+        """溜まっている認識結果を時間の上限まで処理（戻り値: 取り出した結果の数。認識エラー時はNone）
+
+        1件は必ず処理し、上限を超えた分は次のタイマーに持ち越す。続けて届いた同じ内容の結果は
+        1回だけ実行し、実行したコマンドは設定に応じて1回の「元に戻す」にまとめる。
+        """
+        start = time.perf_counter()
+        batch_undo = context.scene.bvc_command_props.batch_undo
+        taken = 0
+        deduplicated = 0
+        deferred = False
+        previous_text = None
+        executed_texts = []
+        while True:
+            if taken and time.perf_counter() - start >= RESULT_DISPATCH_BUDGET:
+                deferred = not voice_mgr.result_queue.empty()
+                break
+            result = voice_mgr.get_latest_result()
+            if result is None:
+                break
+            taken += 1
+            if "timestamp" in result:
+                voice_mgr.dispatch_metrics.record_wait(time.time() - result["timestamp"])
+            
+            if "error" in result:
+                self.report({'ERROR'}, f"音声認識エラー: {result['error']}")
+                return None
+            
+            text = result.get("text", "").strip().lower()
+            if text and text == previous_text:
+                deduplicated += 1
+                print(f"直前と同じ認識結果のためスキップ: '{text}'")
+                continue
+            previous_text = text
+            
+            # 音声コマンドを処理
+            if self.process_voice_command(result, context):
+                executed_texts.append(text)
+                if not batch_undo:
+                    self.push_undo(text)
+        
+        if batch_undo and executed_texts:
+            self.push_undo(", ".join(executed_texts))
+        if taken:
+            voice_mgr.dispatch_metrics.record_tick(
+                time.perf_counter() - start, taken - deduplicated, deduplicated, deferred
+            )
+        return taken
+    
+    def push_undo(self, label):
+        """実行した音声コマンドを「元に戻す」の1ステップとして記録"""
+        try:
+            bpy.ops.ed.undo_push(message=f"音声コマンド: {label}")
+        except RuntimeError as e:
+            print(f"元に戻すステップを記録できませんでした: {e}")
+    
     def process_voice_command(self, result, context):
-        command_props = bpy.context.scene.bvc_command_props
-        """認識した音声からコマンドを実行（pywhispercpp対応）"""
+        """認識した音声からコマンドを実行（pywhispercpp対応、戻り値: コマンドを実行したか）"""
         original_text = result.get("text", "").strip()
         # 小文字変換のみ（カタカナ変換は後で言語判定に基づいて行う）
         text = original_text.lower()
         
         if not text:
-            return
+            return False
         
         engine_name = "pywhispercpp" if self.use_pywhisper else "faster-whisper"
         print(f"\n認識音声: '{text}'")
@@ -139,7 +260,7 @@ class VOICE_OT_bvc_mode(Operator):
         confidence = result.get("confidence", 1.0)
         if confidence < 0.5:
             print(f"信頼度が低いため処理をスキップ: {confidence:.3f}")
-            return
+            return False
         
         # コマンド実行処理
         executed = False
@@ -159,136 +280,82 @@ class VOICE_OT_bvc_mode(Operator):
                 
         except Exception as e:
             print(f"コマンド処理エラー: {e}")
+        return executed
     
     def try_json_commands(self, text, original_text, context):
-        """JSONコマンドの実行を試行"""
+        """JSONコマンドの実行を試行（インデックスを使い、認識のたびにJSONやPropertyを読み直さない）"""
         try:
-            from .util import load_commands_from_json
-            if not load_commands_from_json():
-                self.report({'ERROR'}, "JSONファイルの読み込みに失敗しました")
-                return {'FINISHED'}
-
-            command_props = bpy.context.scene.bvc_command_props
-            
-            # 音声認識結果から言語を判定（元のテキストを使用）
-            def detect_language_from_text(text):
-                """テキストから言語を簡易判定し、JSONの言語名に対応させる"""
-                # 日本語文字（ひらがな、カタカナ、漢字）が含まれているかチェック
-                hiragana_present = any('\u3040' <= char <= '\u309F' for char in text)
-                katakana_present = any('\u30A0' <= char <= '\u30FF' for char in text)
-                chinese_chars = any('\u4E00' <= char <= '\u9FAF' for char in text)
-                
-                # JSONに登録されている実際の言語名を確認
-                available_languages = [lang.language_name for lang in command_props.language_commands]
-                
-                # 日本語判定
-                if hiragana_present or katakana_present:
-                    # JSONに登録されている日本語の名前を探す
-                    for lang_name in available_languages:
-                        if '日本' in lang_name or 'japanese' in lang_name.lower() or 'ja' == lang_name.lower():
-                            return lang_name
-                    return "日本語"  # フォールバック
-                
-                # 中国語判定
-                elif chinese_chars and not hiragana_present and not katakana_present:
-                    for lang_name in available_languages:
-                        if '中国' in lang_name or 'chinese' in lang_name.lower() or 'zh' == lang_name.lower():
-                            return lang_name
-                    return "中国語"  # フォールバック
-                
-                # 英語判定（デフォルト）
-                else:
-                    # JSONに登録されている英語の名前を探す
-                    for lang_name in available_languages:
-                        if 'english' in lang_name.lower() or 'en' == lang_name.lower() or '英語' in lang_name:
-                            return lang_name
-                    # 見つからない場合は最初の言語を使用
-                    if available_languages:
-                        return available_languages[0]
-                    return "英語"  # フォールバック
+            from .command_index import command_index, detect_command_language, normalize_command_text
+            # command.jsonが更新されていた場合のみインデックスを作り直す
+            index = command_index.ensure_current()
             
             # 元のテキストから言語を判定
-            detected_language = detect_language_from_text(original_text)
+            detected_language = detect_command_language(original_text, index.language_names())
             print(f"Detected language from original text '{original_text}': {detected_language}")
             
-            # 検出された言語に基づいてテキストを処理
-            if detected_language == "日本語":
-                # 日本語の場合のみカタカナ変換
-                from .util import to_katakana
-                processed_text = to_katakana(text)
-                print(f"Japanese text converted: '{text}' -> '{processed_text}'")
-            else:
-                # 他の言語はそのまま
-                processed_text = text
+            # 検出された言語に基づいてテキストを処理（日本語のみカタカナ変換し、句読点を削除）
+            # コマンドキーはインデックス作成時に同じ方法で正規化済み
+            processed_text = normalize_command_text(text, detected_language)
+            print(f"Normalized text: '{text}' -> '{processed_text}'")
             
-            # 句読点を削除
-            import string
-            processed_text = processed_text.translate(str.maketrans('', '', string.punctuation + '。、．，！？'))
-            print(f"Punctuation removed: -> '{processed_text}'")
+            # 全コマンドキーを1回の走査で照合（重なる場合は長いキー→優先度→ファイル内の順）
+            fuzzy_ratio = context.scene.bvc_command_props.fuzzy_match_ratio
+            description_threshold = context.scene.bvc_command_props.description_match_threshold
+            index.set_fuzzy_ratio(fuzzy_ratio)
+            matcher = index.matcher(detected_language)
+            record = matcher.best_match(processed_text) if matcher else None
+            confidence = 1.0
             
-            # JSONに登録されている言語リストを表示
-            print(f"\nJSONに登録されている言語:")
-            for lang_item in command_props.language_commands:
-                print(f"  - '{lang_item.language_name}' (コマンド数: {len(lang_item.commands)})")
-            print(f"検出された言語: '{detected_language}'")
+            # 完全一致がなければ、1文字程度の誤認識を許してあいまい照合
+            if record is None and matcher and fuzzy_ratio > 0:
+                fuzzy = matcher.fuzzy_match(processed_text, context.scene.bvc_command_props.fuzzy_min_confidence)
+                if fuzzy:
+                    record, confidence = fuzzy
             
-            #言語別のコマンドリストを確認
-            for lang_items in command_props.language_commands:
-                # 検出された言語と一致する場合のみチェック
-                if lang_items.language_name == detected_language:
-                    print(f"Checking commands for language: {lang_items.language_name}")
-                    for cmd_item in lang_items.commands:
-                        
-                        # 日本語の場合のみコマンドキーをカタカナ変換してから比較
-                        if detected_language == "日本語":
-                            normalized_cmd_key = to_katakana(cmd_item.command_key.lower())
-                            print(f"Converted command key: '{cmd_item.command_key.lower()}' -> '{normalized_cmd_key}'")
-                        else:
-                            normalized_cmd_key = cmd_item.command_key.lower()
-                        
-                        # コマンドキーからも句読点を削除
-                        normalized_cmd_key = normalized_cmd_key.translate(str.maketrans('', '', string.punctuation + '。、．，！？'))
-                        print(f"Command key after punctuation removal: '{normalized_cmd_key}'")
-                        
-                        if normalized_cmd_key in processed_text:
-                            print(f"マッチ: '{processed_text}' -> '{cmd_item.command_description}'")
-                            # コマンドに対応する処理を実行
-                            code = getattr(cmd_item, "command_code", None)
-                            print(f"コード取得: {repr(code)}")
-                            print(f"コードの状態: 型={type(code).__name__}, 空={code is None or code == ''}, 空白のみ={code.strip() == '' if isinstance(code, str) else 'N/A'}")
-                            
-                            if code and isinstance(code, str) and code.strip():
-                                try:
-                                    print(f"コード実行開始: {cmd_item.command_key}")
-                                    # Blenderのグローバル環境を渡す
-                                    exec_globals = {
-                                        'bpy': bpy,
-                                        '__builtins__': __builtins__,
-                                    }
-                                    # 必要に応じて他のモジュールも追加
-                                    exec(code, exec_globals)
-                                    print(f"コマンド実行成功: {cmd_item.command_description}")
-                                    return True
-                                except RuntimeError as e:
-                                    # Blender操作エラー（ファイル未保存など）もコマンドとしては認識されている
-                                    error_msg = str(e)
-                                    print(f"コマンド '{cmd_item.command_key}' 実行中にエラー: {error_msg}")
-                                    if "Unable to save" in error_msg and "filepath" in error_msg:
-                                        print(f"ヒント: ファイルを一度手動で保存してから、このコマンドを使用してください")
-                                    return True  # コマンドは認識されたのでTrueを返す
-                                except Exception as e:
-                                    print(f"コマンド実行エラー: {e}")
-                                    import traceback
-                                    traceback.print_exc()
-                                    return True  # コマンドは認識されたのでTrueを返す
-                            else:
-                                print(f"コードが空またはNullです。コマンドは登録されていますが実行可能なコードがありません")
-                                print(f"   コマンド名: {cmd_item.command_key}")
-                                print(f"   説明: {cmd_item.command_description}")
-                                return False
-                        else:
-                            print(f"JSON command mismatch: '{processed_text}' does not contain '{normalized_cmd_key}'")
-            return False
+            # それでもなければ説明文との類似度で照合（言い換えに対応）
+            if record is None and matcher and description_threshold > 0:
+                similar = matcher.description_match(processed_text, description_threshold)
+                if similar:
+                    record, confidence = similar
+            
+            if record is None:
+                print(f"JSON command mismatch: '{processed_text}'")
+                return False
+            
+            print(f"マッチ: '{processed_text}' -> '{record.description}' (信頼度: {confidence:.2f})")
+            
+            # ポップアップからの実行と同じポリシーで検査（判定はコードごとにキャッシュ済み）
+            from .command_security import check_command_code, policy_from_props
+            compiled, code_error = check_command_code(record.code, policy_from_props(context.scene.bvc_command_props))
+            if code_error:
+                print(f"コマンド '{record.key}' のコードを実行できません: {code_error}")
+                return True  # コマンドは認識されたのでTrueを返す
+            
+            if compiled is not None:
+                try:
+                    print(f"コード実行開始: {record.key}")
+                    # ポップアップからの実行と共通の実行環境で実行（実行時間も記録される）
+                    from .command_runtime import command_environment
+                    elapsed = command_environment.execute(record.key, compiled)
+                    print(f"コマンド実行成功: {record.description} ({elapsed * 1000:.1f} ms)")
+                    return True
+                except RuntimeError as e:
+                    # Blender操作エラー（ファイル未保存など）もコマンドとしては認識されている
+                    error_msg = str(e)
+                    print(f"コマンド '{record.key}' 実行中にエラー: {error_msg}")
+                    if "Unable to save" in error_msg and "filepath" in error_msg:
+                        print(f"ヒント: ファイルを一度手動で保存してから、このコマンドを使用してください")
+                    return True  # コマンドは認識されたのでTrueを返す
+                except Exception as e:
+                    print(f"コマンド実行エラー: {e}")
+                    import traceback
+                    traceback.print_exc()
+                    return True  # コマンドは認識されたのでTrueを返す
+            else:
+                print(f"コードが空またはNullです。コマンドは登録されていますが実行可能なコードがありません")
+                print(f"   コマンド名: {record.key}")
+                print(f"   説明: {record.description}")
+                return False
         except Exception as e:
             print(f"JSON コマンド処理エラー: {e}")
             return False
@@ -305,9 +372,12 @@ class VOICE_OT_bvc_mode(Operator):
         
         # タイマー削除
         if self._timer:
-            wm = context.window_manager
-            wm.event_timer_remove(self._timer)
+            self._timer.stop()
             self._timer = None
+        self._override = {}
+        
+        # 停止後の状態をパネルに反映
+        tag_sidebar_redraw(context.window_manager)
         
         self.is_voice_active = False
         
@@ -331,6 +401,19 @@ class VOICE_OT_search_device(Operator):
         print("device_name:", self.device_name)
         props = context.scene.bvc_device_props
         props.selected_device = self.device_name  # ←選択したデバイス名をセット
+        
+        # キャリブレーション済みのデバイスなら、その閾値とプリロールを適用
+        from .device_profiles import get_device_profile
+        try:
+            device_id = find_input_device_id(self.device_name)
+            profile = get_device_profile(get_device_profile_key(device_id)) if device_id is not None else None
+        except Exception as e:
+            print(f"デバイスプロファイル取得エラー: {e}")
+            profile = None
+        if profile:
+            props.volume_threshold = profile["volume_threshold"]
+            props.pre_roll_ms = profile.get("pre_roll_ms", props.pre_roll_ms)
+            self.report({'INFO'}, f"キャリブレーション結果を適用しました（閾値: {props.volume_threshold:.2f}）")
         return {'FINISHED'}
 
 ###########################################
@@ -546,6 +629,7 @@ class VOICE_OT_select_language(bpy.types.Operator):
                             new_item.name = cmd_item.command_key
                             new_item.description = cmd_item.command_description
                             new_item.code = getattr(cmd_item, "command_code", f"# {lang_item.language_name}: {cmd_item.command_key}\nprint('【{lang_item.language_name}】{cmd_item.command_key}: {cmd_item.command_description}')")
+                            new_item.priority = cmd_item.command_priority
                                                         
                             if hasattr(new_item, 'value'):
                                 new_item.value = len(scene.command_items)
@@ -629,6 +713,7 @@ class VOICE_OT_reload_commands(bpy.types.Operator):
                         new_item.name = cmd_item.command_key
                         new_item.description = cmd_item.command_description
                         new_item.code = getattr(cmd_item, "command_code", f"# {lang_item.language_name}: {cmd_item.command_key}\nprint('【{lang_item.language_name}】{cmd_item.command_key}: {cmd_item.command_description}')")
+                        new_item.priority = cmd_item.command_priority
 
                         if hasattr(new_item, 'value'):
                             new_item.value = len(scene.command_items)
@@ -743,6 +828,12 @@ class VOICE_OT_edit_command_inline(bpy.types.Operator):
         col = box.column()
         col.label(text="コード:")
         col.prop(self, "edit_code", text="")
+        
+        # 構文エラー・ポリシー違反があれば編集中に表示
+        from .command_security import check_command_code, policy_from_props
+        _, code_error = check_command_code(self.edit_code, policy_from_props(context.scene.bvc_command_props))
+        if code_error:
+            col.label(text=code_error, icon='ERROR')
 
     def execute(self, context):
         # 変更を保存
@@ -773,51 +864,20 @@ class VOICE_OT_execute_command_popup(bpy.types.Operator):
             
             try:
                 if item.code.strip():
-                    # 危険なコードの基本チェック
-                    dangerous_functions = ['import os', 'import sys', 'open(', 'file(', 'exec(', 'eval(']
-                    code_lower = item.code.lower()
-                    
-                    for danger in dangerous_functions:
-                        if danger in code_lower:
-                            self.report({'ERROR'}, f"安全上の理由により実行できません: '{danger}' が含まれています")
-                            return {'CANCELLED'}
-                    
-                    # Blenderのグローバル環境を含めて実行
-                    exec_globals = {
-                        'bpy': bpy,
-                        'bmesh': None,  # 必要に応じてimport
-                        '__builtins__': __builtins__
-                    }
-                    
-                    # 追加で利用可能なライブラリを設定
-                    try:
-                        import mathutils
-                        exec_globals['mathutils'] = mathutils
-                    except ImportError:
-                        pass
-                    
-                    try:
-                        import math
-                        exec_globals['math'] = math
-                    except ImportError:
-                        pass
-                        
-                    try:
-                        import random
-                        exec_globals['random'] = random
-                    except ImportError:
-                        pass
-                    
-                    # bmeshが必要かチェック
-                    if 'bmesh' in item.code:
-                        import bmesh
-                        exec_globals['bmesh'] = bmesh
+                    # 音声からの実行と同じポリシーで検査し、コンパイル済みのコードを取得
+                    # （構文木・判定結果はコードごとにキャッシュされるため再解析しない）
+                    from .command_security import check_command_code, policy_from_props
+                    compiled, code_error = check_command_code(item.code, policy_from_props(scene.bvc_command_props))
+                    if code_error:
+                        self.report({'ERROR'}, f"コマンド '{item.name}': {code_error}")
+                        return {'CANCELLED'}
                     
                     print(f"実行開始: {item.name}")
                     print(f"コード:\n{item.code}")
                     
-                    # コードを実行
-                    exec(item.code, exec_globals)
+                    # 音声からの実行と共通の実行環境で実行（bmesh等は使われたときにimportされる）
+                    from .command_runtime import command_environment
+                    elapsed = command_environment.execute(item.name, compiled)
                     
                     # 画面を更新
                     for area in context.screen.areas:
@@ -826,7 +886,7 @@ class VOICE_OT_execute_command_popup(bpy.types.Operator):
                     
                     # 成功メッセージ
                     self.report({'INFO'}, f"コマンド '{item.name}' を実行しました")
-                    print(f"実行完了: {item.name}")
+                    print(f"実行完了: {item.name} ({elapsed * 1000:.1f} ms)")
                     
                 else:
                     self.report({'WARNING'}, "実行するコードがありません")
@@ -838,6 +898,171 @@ class VOICE_OT_execute_command_popup(bpy.types.Operator):
         
         return {'FINISHED'}
 
+###########################################
+#   　 　　環境ノイズのキャリブレーション
+###########################################
+class VOICE_OT_calibrate_noise(Operator):
+    """選択中のデバイスで環境ノイズを録音し、閾値を自動設定"""
+    bl_idname = "voice.calibrate_noise"
+    bl_label = "環境ノイズのキャリブレーション"
+    bl_description = "数秒間の無音（環境ノイズ）を録音して推奨の閾値を計算し、デバイスごとに保存します"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    duration: bpy.props.FloatProperty(
+        name="録音時間(秒)",
+        default=3.0,
+        min=1.0,
+        max=10.0
+    )
+
+    def execute(self, context):
+        # テスト録音なしで選択中（なければ既定）のデバイスを使う
+        device_id = resolve_input_device_id()
+        if device_id is None:
+            self.report({'ERROR'}, "録音デバイスが見つかりません")
+            return {'CANCELLED'}
+
+        # 話さずに環境ノイズだけをバックグラウンドで録音する（録音中もUIを止めない）
+        self._device_id = device_id
+        self._recorder = ClipRecorder(device_id, self.duration)
+        self._recorder.start()
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        # 録音が始まる前に案内を表示
+        context.workspace.status_text_set(
+            f"環境ノイズを録音中（{self.duration:.0f}秒）: 話さずにお待ちください"
+        )
+        self.report({'INFO'}, "環境ノイズを録音します。話さずにお待ちください")
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type != 'TIMER' or self._recorder.is_alive():
+            return {'PASS_THROUGH'}
+
+        context.window_manager.event_timer_remove(self._timer)
+        context.workspace.status_text_set(None)
+        return self.finish(context)
+
+    def finish(self, context):
+        """録音した環境ノイズから閾値を計算してデバイスごとに保存"""
+        from .device_profiles import (
+            analyze_room_tone,
+            build_device_profile,
+            save_device_profile,
+        )
+
+        props = context.scene.bvc_device_props
+        device_id = self._device_id
+        try:
+            if self._recorder.error or self._recorder.audio is None:
+                raise RuntimeError(self._recorder.error or "録音データがありません")
+            stats = analyze_room_tone(self._recorder.audio)
+            device = sd.query_devices(device_id)
+            hostapi_name = sd.query_hostapis(device['hostapi'])['name']
+            profile = build_device_profile(device['name'], hostapi_name, stats, props.pre_roll_ms)
+        except Exception as e:
+            self.report({'ERROR'}, f"キャリブレーションに失敗: {e}")
+            return {'CANCELLED'}
+
+        if not save_device_profile(get_device_profile_key(device_id), profile):
+            self.report({'ERROR'}, "デバイスプロファイルの保存に失敗しました")
+            return {'CANCELLED'}
+
+        props.volume_threshold = profile["volume_threshold"]
+        proposals = stats["proposed_thresholds"]
+        print(f"環境ノイズ: {stats['rms_db']:.1f} dB, 推奨閾値: "
+              f"敏感 {proposals['sensitive']:.2f} / 標準 {proposals['standard']:.2f} / 控えめ {proposals['conservative']:.2f}")
+        self.report({'INFO'}, f"{device['name']} の閾値を {props.volume_threshold:.2f} に設定しました（環境ノイズ {stats['rms_db']:.1f} dB）")
+        return {'FINISHED'}
+
+###########################################
+#   　 　　推論設定の自動計測
+###########################################
+REFERENCE_CLIP_SECONDS = 5.0  # リファレンス音声の録音時間
+
+class VOICE_OT_calibrate_model(Operator):
+    """リファレンス音声で計算精度・スレッド数ごとの速度を計測し、最速の設定を保存"""
+    bl_idname = "voice.calibrate_model"
+    bl_label = "推論設定の自動計測"
+    bl_description = "リファレンス音声を各計算精度・スレッド数で認識し、精度の下限を満たす最速の設定を保存します"
+    bl_options = {'REGISTER'}
+
+    accuracy_floor: bpy.props.FloatProperty(
+        name="精度の下限",
+        description="基準テキストとの一致率の下限",
+        default=0.9,
+        min=0.0,
+        max=1.0
+    )
+
+    def execute(self, context):
+        from .model_registry import (
+            model_registry,
+            read_wav_clip,
+            REFERENCE_CLIP_PATH,
+        )
+
+        if model_registry.calibration_running:
+            self.report({'WARNING'}, "自動計測は既に実行中です")
+            return {'CANCELLED'}
+
+        # 同梱のリファレンス音声があればそのまま計測を開始
+        if os.path.exists(REFERENCE_CLIP_PATH):
+            try:
+                audio = read_wav_clip(REFERENCE_CLIP_PATH)
+            except Exception as e:
+                self.report({'ERROR'}, f"リファレンス音声の読み込みに失敗: {e}")
+                return {'CANCELLED'}
+            return self.start_calibration(audio, save_clip_path=None)
+
+        # なければ選択中のデバイスでバックグラウンドで録音する（録音中もUIを止めない）
+        device_id = resolve_input_device_id()
+        if device_id is None:
+            self.report({'ERROR'}, "リファレンス音声がなく、録音デバイスも見つかりません")
+            return {'CANCELLED'}
+        self._recorder = ClipRecorder(device_id, REFERENCE_CLIP_SECONDS)
+        self._recorder.start()
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        # 録音が始まる前に案内を表示
+        context.workspace.status_text_set(
+            f"リファレンス音声を録音中（{REFERENCE_CLIP_SECONDS:.0f}秒）: コマンドを数回読み上げてください"
+        )
+        self.report({'INFO'}, "リファレンス音声を録音します。コマンドを数回読み上げてください")
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type != 'TIMER' or self._recorder.is_alive():
+            return {'PASS_THROUGH'}
+
+        context.window_manager.event_timer_remove(self._timer)
+        context.workspace.status_text_set(None)
+        recorder = self._recorder
+        if recorder.error or recorder.audio is None:
+            self.report({'ERROR'}, f"リファレンス音声の録音に失敗: {recorder.error}")
+            return {'CANCELLED'}
+        # 録音した音声は、文字が認識できた場合だけ計測スレッドが保存する
+        from .model_registry import REFERENCE_CLIP_PATH
+        return self.start_calibration(recorder.audio, save_clip_path=REFERENCE_CLIP_PATH)
+
+    def start_calibration(self, audio, save_clip_path):
+        from .model_registry import model_registry, read_reference_text
+
+        if model_registry.start_calibration(
+            audio,
+            reference_text=read_reference_text(),
+            accuracy_floor=self.accuracy_floor,
+            language=get_active_language(),
+            save_clip_path=save_clip_path
+        ):
+            self.report({'INFO'}, "推論設定の自動計測をバックグラウンドで開始しました")
+            return {'FINISHED'}
+
+        self.report({'ERROR'}, model_registry.calibration_status or "自動計測を開始できませんでした")
+        return {'CANCELLED'}
+
 ##############################################
 #  　 　　音声識別
 ##############################################
@@ -887,19 +1112,32 @@ class VOICE_OT_speech_recognition(Operator):
                     self.report({'ERROR'}, "マイクが接続されているか確認してください")
                     return {'CANCELLED'}
         
+        # コールバック内ではprintせず、計測値とログ出力スレッド（有効時のみ）に任せる
+        recording_metrics.reset()
+        logger = None
+        if getattr(bpy.context.scene.bvc_device_props, "debug_audio_log", False):
+            logger = AudioDebugLogger(recording_metrics)
+            logger.start()
         try:
             # 音声認識部分
             self.report({'INFO'}, "音声入力を開始します...")
-            with sd.InputStream(
-                callback=callback, 
-                channels=1, 
-                samplerate=16000,
-                device=selected_device
-            ):
-                # Blender UIをブロックしないように、短時間の録音に変更
-                print("録音中... (5秒間)")
-                sd.sleep(5000)  # 5秒録音
-                recognize_from_queue()  # 定期的にキューから音声を取り出し認識
+            try:
+                with sd.InputStream(
+                    callback=make_recording_callback(recording_metrics, logger), 
+                    channels=1, 
+                    samplerate=16000,
+                    device=selected_device
+                ):
+                    # Blender UIをブロックしないように、短時間の録音に変更
+                    print("録音中... (5秒間)")
+                    sd.sleep(5000)  # 5秒録音
+                    recognize_from_queue()  # 定期的にキューから音声を取り出し認識
+            finally:
+                if logger:
+                    logger.stop()
+            stats = recording_metrics.snapshot()
+            print(f"録音: ブロック {stats['blocks']} (音声 {stats['voiced_blocks']}) "
+                  f"溢れ {stats['input_overflows']} ピーク {stats['peak_level']:.2f}")
             
             self.report({'INFO'}, "音声録音が完了しました")
             return {'FINISHED'}
@@ -1028,6 +1266,7 @@ class VOICE_OT_volume_threshold_info(Operator):
         col.label(text="  1. 通常の声の大きさで話す")
         col.label(text="  2. 認識が開始される値まで調整")
         col.label(text="  3. 雑音で誤作動しない値を確認")
+        col.label(text="  ※ 閾値横の録音ボタンで環境ノイズから自動設定できます")
         
         # 現在の設定値を表示
         if hasattr(context.scene, 'bvc_device_props'):
@@ -4,6 +4,8 @@ from .OperatorTool import *
 from .MenuTool import *
 from .BVCProperties import *
 from .util import *
+from .command_security import check_command_code, policy_from_props
+from .command_runtime import command_environment
 
 ###########################################
 #   　 　　音声認識のUI表示
@@ -31,8 +33,21 @@ class VOICE_PT_bvc_mode(Panel):
         for key, label in props.language_keys:
             row_button.prop(props, key, text=label)
         
-        # 詳細な状態情報を取得
-        status_info = voice_manager.get_status_info()
+        # 表示用の状態（状態が変わったときだけ作り直されるキャッシュ）
+        status_info = voice_manager.get_view_model()
+        
+        # 音声認識モデルの読み込み状態を表示
+        model_state = status_info["model_state"]
+        model_icon = {
+            "READY": 'CHECKMARK',
+            "LOADING": 'SORTTIME',
+            "FAILED": 'ERROR',
+        }.get(model_state, 'DOT')
+        row = draw_layout.row()
+        row.label(text=f"モデル: {status_info['model_state_label']}", icon=model_icon)
+        row.prop(context.scene.bvc_mode_props, "preload_model", text="事前読み込み")
+        if model_state == "FAILED" and status_info["model_error"]:
+            draw_layout.label(text=f"  {status_info['model_error'][:40]}")
         
         # 音声認識の状態を表示
         if status_info["is_active"]:
@@ -45,10 +60,8 @@ class VOICE_PT_bvc_mode(Panel):
             box = draw_layout.box()
             #box.label(text=f"デバイス: {status_info['current_device']}", icon='SOUND')
             
-            # 認識言語を表示
-            active_language_code = get_active_language()
-            active_language_name = code_to_display_name(active_language_code)
-            box.label(text=f"認識言語: {active_language_name}", icon='SOUND')
+            # 認識言語を表示（認識スレッドに公開済みの設定から）
+            box.label(text=f"認識言語: {status_info['language_name']}", icon='SOUND')
             # 実行時間を表示
             if "duration" in status_info:
                 box.label(text=f"経過時間: {status_info['duration']}秒", icon='TIME')
@@ -57,11 +70,54 @@ class VOICE_PT_bvc_mode(Panel):
             if "audio_level_indicator" in status_info:
                 level_text = status_info["audio_level_indicator"]
                 if level_text:
-                    # 音声レベルを視覚的に表示
+                    # 音声レベルを視覚的に表示（バー表示に対応していないバージョンでは文字のみ）
                     level_box = box.box()
                     level_row = level_box.row()
-                    level_row.alignment = 'CENTER'
-                    level_row.label(text=f"音声レベル: {level_text}", icon='SOUND')
+                    if hasattr(level_row, "progress"):
+                        level_row.label(text="", icon='SOUND')
+                        level_row.progress(factor=status_info["audio_level"], text=level_text)
+                    else:
+                        level_row.alignment = 'CENTER'
+                        level_row.label(text=f"音声レベル: {level_text}", icon='SOUND')
+            
+            # 録音コールバックの計測値（ドライバ側で入力が溢れた場合は強調）
+            if "audio_metrics" in status_info:
+                metrics = status_info["audio_metrics"]
+                row = box.row()
+                row.alert = metrics["input_overflows"] > 0
+                row.label(
+                    text=f"ブロック: {metrics['blocks']} (音声 {metrics['voiced_blocks']}) "
+                         f"溢れ: {metrics['input_overflows']} ピーク: {metrics['peak_level']:.2f}",
+                    icon='INFO'
+                )
+            
+            # メインスレッドでの認識結果の処理時間（持ち越しが発生している場合は強調）
+            if "dispatch_metrics" in status_info:
+                dispatch = status_info["dispatch_metrics"]
+                if dispatch["ticks"]:
+                    row = box.row()
+                    row.alert = dispatch["deferred_ticks"] > 0
+                    row.label(
+                        text=f"処理: {dispatch['executed']}件 (重複 {dispatch['deduplicated']}) "
+                             f"{dispatch['last_tick_ms']:.1f} ms / 最大 {dispatch['max_tick_ms']:.1f} ms "
+                             f"待ち {dispatch['last_wait_ms']:.0f} ms",
+                        icon='SORTTIME'
+                    )
+                # 結果の確認間隔（待機中は延びる）
+                box.label(
+                    text=f"確認間隔: {dispatch['interval_ms']:.0f} ms (呼び出し {dispatch['wakeups']}回)",
+                    icon='TIME'
+                )
+            
+            # 推論が追いつかずに捨てた・結合したデータがあれば表示
+            dropped = (
+                status_info.get("dropped_windows", 0),
+                status_info.get("coalesced_windows", 0),
+                status_info.get("audio_overruns", 0),
+                status_info.get("dropped_results", 0),
+            )
+            if any(dropped):
+                box.label(text=f"破棄 区間:{dropped[0]} 結合:{dropped[1]} 音声:{dropped[2]} 結果:{dropped[3]}", icon='ERROR')
             
             # 最新の認識結果があれば表示
             if status_info["last_result"] and "text" in status_info["last_result"]:
@@ -115,7 +171,38 @@ class VOICE_PT_device_setting(Panel):
         row = draw_layout.row()
         row.label(text="ボリューム閾値の調整(0~1)", icon='OUTLINER_OB_SPEAKER')
         row.operator("voice.volume_threshold_info", text="", icon='INFO')
-        draw_layout.prop(props, "volume_threshold", slider=True)
+        row = draw_layout.row(align=True)
+        row.prop(props, "volume_threshold", slider=True)
+        row.operator("voice.calibrate_noise", text="", icon='REC')
+
+        # 認識区間の切り出し方
+        draw_layout.prop(props, "segmentation_mode", text="区間")
+        if props.segmentation_mode == 'ENDPOINT':
+            row = draw_layout.row(align=True)
+            row.prop(props, "endpoint_silence_ms", text="無音(ms)")
+            row.prop(props, "max_segment_seconds", text="最大(秒)")
+            draw_layout.prop(props, "pre_roll_ms", text="プリロール(ms)")
+        draw_layout.prop(props, "min_speech_ms", text="最小音声長(ms)")
+
+        draw_layout.separator()
+
+        # 推論設定（計算精度・スレッド数）
+        from .model_registry import model_registry
+        draw_layout.label(text="推論設定", icon='PREFERENCES')
+        row = draw_layout.row()
+        row.prop(props, "compute_type", text="")
+        row.prop(props, "cpu_threads", text="スレッド")
+        row = draw_layout.row()
+        row.prop(props, "window_queue_size", text="推論待ち")
+        row.prop(props, "window_queue_policy", text="")
+        model_status = model_registry.get_status()
+        draw_layout.label(text=f"使用中: {model_status['compute_type']} / {model_status['cpu_threads']}スレッド")
+        row = draw_layout.row()
+        row.enabled = not model_status["calibration_running"]
+        row.operator("voice.calibrate_model", text="自動計測", icon='SORTTIME')
+        if model_status["calibration_status"]:
+            draw_layout.label(text=model_status["calibration_status"])
+        draw_layout.prop(props, "debug_audio_log")
     
 
 ###########################################
@@ -179,6 +266,26 @@ class VOICE_PT_command_setting(Panel):
         col.operator(Voice_OT_command_add.bl_idname, icon='ADD', text="")    # ＋ボタン
         col.operator(Voice_OT_command_remove.bl_idname, icon='REMOVE', text="")  # －ボタン
 
+        # 照合設定
+        if hasattr(scene, 'bvc_command_props'):
+            row = draw_layout.row()
+            row.prop(scene.bvc_command_props, "fuzzy_match_ratio", text="あいまい照合")
+            row.prop(scene.bvc_command_props, "fuzzy_min_confidence", text="信頼度")
+            row.prop(scene.bvc_command_props, "description_match_threshold", text="説明文")
+            row = draw_layout.row()
+            row.prop(scene.bvc_command_props, "code_policy", text="検査")
+            row.prop(scene.bvc_command_props, "allowed_imports", text="import")
+            draw_layout.prop(scene.bvc_command_props, "batch_undo")
+
+        # 平均実行時間が最も長いコマンド
+        slowest = command_environment.slowest()
+        if slowest:
+            name, average, longest = slowest
+            draw_layout.label(
+                text=f"最も遅いコマンド: {name}（平均 {average * 1000:.1f} ms / 最大 {longest * 1000:.1f} ms）",
+                icon='TIME'
+            )
+
             
 
 ###########################################
@@ -228,11 +335,16 @@ class Command_UL_items(bpy.types.UIList):
             
             split3 = split2.split(factor=0.6)  # 残りの60%をcodeに
             col3 = split3.column()
-            col3.prop(item, "code", text="")
+            # 構文エラー・ポリシー違反のあるコードは赤く表示（判定結果はキャッシュ済み）
+            _, code_error = check_command_code(item.code, policy_from_props(context.scene.bvc_command_props))
+            col3.alert = code_error is not None
+            col3.prop(item, "code", text="", icon='ERROR' if code_error else 'NONE')
             
             # ボタン列（右側、残りの空間）
             col4 = split3.column()
             row_buttons = col4.row(align=True)
+            # 重なって一致したときの優先度
+            row_buttons.prop(item, "priority", text="")
             
             # 実行ボタンを追加
             row_buttons.operator("voice.execute_command_popup", text="", icon='PLAY').item_index = index
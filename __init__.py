@@ -71,6 +71,8 @@ regist_classes = (
     VOICE_OT_edit_command_inline,
     VOICE_OT_execute_command_popup,
     VOICE_OT_volume_threshold_info,
+    VOICE_OT_calibrate_model,
+    VOICE_OT_calibrate_noise,
     VOICE_OT_device_info,
     VOICE_OT_command_info,
 
@@ -122,6 +124,19 @@ def register():
     # 0.5秒後に実行するタイマーを設定（初期化をより確実に待つ）
     bpy.app.timers.register(delayed_json_load, first_interval=0.5)
     
+    # 事前読み込みが有効な場合のみ、モデルをバックグラウンドで読み込む
+    def delayed_model_preload():
+        try:
+            if bpy.context.scene.bvc_mode_props.preload_model:
+                # 録音開始時と同じ推論設定で読み込む（設定が違うと録音開始時に読み込み直しになる）
+                from .util import request_model_load
+                request_model_load()
+        except Exception as e:
+            print(f"モデルの事前読み込みに失敗: {e}")
+        return None  # タイマーを停止
+    
+    bpy.app.timers.register(delayed_model_preload, first_interval=0.5)
+    
 
 # 作成クラスと定義の登録解除メソッド
 def unregister():
@@ -0,0 +1,64 @@
+"""
+処理があるときだけ短い間隔で動くメインスレッドのタイマー
+bpy.app.timersに登録し、処理が続いている間は短い間隔で、
+何もない間は間隔を倍々に延ばして、待機中にBlenderを起こす回数を減らす
+"""
+import bpy
+
+TIMER_MIN_INTERVAL = 0.02   # 処理があるとき・発話中の間隔（秒）
+TIMER_MAX_INTERVAL = 0.5    # 何もないときに延ばす上限（秒）
+TIMER_BACKOFF = 2.0         # 何もなかったときに間隔を延ばす倍率
+
+
+###########################################
+#   　 　　適応間隔のタイマー
+###########################################
+class AdaptiveTimer:
+    """bpy.app.timersで一定しない間隔で呼び出すタイマー
+
+    callbackはメインスレッドで呼ばれ、まだ処理が続くならTrue、何もなければFalse、
+    タイマーを止めるならNoneを返す。
+    """
+
+    def __init__(self, callback, min_interval=TIMER_MIN_INTERVAL,
+                 max_interval=TIMER_MAX_INTERVAL, backoff=TIMER_BACKOFF):
+        self.callback = callback
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.wakeups = 0           # タイマーが呼ばれた回数
+        self.is_running = False
+        self._function = self._tick  # 登録解除には登録時と同じ関数オブジェクトが必要
+
+    def start(self):
+        """タイマーを開始（最初は短い間隔から）"""
+        self.interval = self.min_interval
+        self.wakeups = 0
+        self.is_running = True
+        if not bpy.app.timers.is_registered(self._function):
+            bpy.app.timers.register(self._function, first_interval=self.interval)
+
+    def stop(self):
+        """タイマーを停止"""
+        self.is_running = False
+        if bpy.app.timers.is_registered(self._function):
+            bpy.app.timers.unregister(self._function)
+
+    def _tick(self):
+        if not self.is_running:
+            return None
+        self.wakeups += 1
+        try:
+            busy = self.callback()
+        except ReferenceError:
+            # 呼び出し元のオペレーターが既に破棄されている
+            busy = None
+        if busy is None:
+            self.is_running = False
+            return None
+        if busy:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        return self.interval
@@ -0,0 +1,102 @@
+"""
+録音データ用のリングバッファ
+PortAudioのコールバック（書き込み側1つ）と処理スレッド（読み出し側1つ）で共有する
+"""
+import threading
+
+import numpy as np
+
+
+###########################################
+#   　 　　float32リングバッファ
+###########################################
+class AudioRingBuffer:
+    """単一書き込み・単一読み出しのfloat32リングバッファ（容量は秒数で固定）"""
+
+    def __init__(self, capacity_seconds, sample_rate=16000):
+        self.sample_rate = sample_rate
+        self.capacity = int(capacity_seconds * sample_rate)
+        self._buffer = np.zeros(self.capacity, dtype=np.float32)
+
+        # 位置は先頭からの累計サンプル数で管理（折り返しはインデックス計算時のみ）
+        self.write_position = 0   # 書き込み側だけが更新
+        self.read_position = 0    # 読み出し側だけが更新
+        self.overrun_count = 0    # 読み出しが追いつかず未読データが上書きされた回数
+        self.data_ready = threading.Event()
+
+    def write(self, data):
+        """コールバックから呼ばれる書き込み（確保済みの領域へコピーするだけ）"""
+        samples = data.reshape(-1)
+        total = samples.shape[0]
+        position = self.write_position
+        if total > self.capacity:
+            # 容量を超える分は古い側を捨てる（累計位置は実際のサンプル数だけ進める）
+            position += total - self.capacity
+            samples = samples[-self.capacity:]
+        count = samples.shape[0]
+
+        start = position % self.capacity
+        first = min(count, self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        if first < count:
+            self._buffer[:count - first] = samples[first:]
+
+        # データを書き終えてから位置を公開する
+        self.write_position += total
+        self.data_ready.set()
+
+    def wait(self, timeout=None):
+        """新しいデータが書き込まれるまで待機"""
+        ready = self.data_ready.wait(timeout)
+        self.data_ready.clear()
+        return ready
+
+    def oldest_position(self):
+        """まだ上書きされていない最も古いサンプルの位置"""
+        return max(0, self.write_position - self.capacity)
+
+    def available(self):
+        """未読のサンプル数"""
+        self._skip_overrun()
+        return self.write_position - self.read_position
+
+    def get_range(self, start, end, copy=False):
+        """累計位置[start, end)のサンプルを取得
+
+        折り返さない範囲はビュー（コピーなし）で返し、折り返す範囲だけ1回コピーする。
+        ビューは書き込み側が1周するまでの間だけ有効なので、保持する場合はcopy=Trueにする。
+        """
+        start = max(start, self.oldest_position())
+        end = min(end, self.write_position)
+        length = max(0, end - start)
+
+        offset = start % self.capacity
+        if offset + length <= self.capacity:
+            view = self._buffer[offset:offset + length]
+            return view.copy() if copy else view
+
+        out = np.empty(length, dtype=np.float32)
+        first = self.capacity - offset
+        out[:first] = self._buffer[offset:]
+        out[first:] = self._buffer[:length - first]
+        return out
+
+    def read(self, count, copy=False):
+        """未読のサンプルをcount個取得して読み出し位置を進める"""
+        self._skip_overrun()
+        start = self.read_position
+        data = self.get_range(start, start + count, copy=copy)
+        self.read_position = start + len(data)
+        return data
+
+    def reset(self):
+        """未読データを破棄（読み出し位置を書き込み位置に合わせる）"""
+        self.read_position = self.write_position
+        self.data_ready.clear()
+
+    def _skip_overrun(self):
+        """上書きされた未読データを読み飛ばす"""
+        oldest = self.oldest_position()
+        if self.read_position < oldest:
+            self.read_position = oldest
+            self.overrun_count += 1
@@ -0,0 +1,183 @@
+"""
+音声パイプラインの部品
+録音データから認識区間を切り出し、推論スレッドへ上限付きキューで受け渡す
+"""
+import queue
+
+import numpy as np
+
+from .vad import FrameVAD
+
+# キューが一杯のときの扱い
+POLICY_DROP_OLDEST = "DROP_OLDEST"  # 最も古い要素を捨てて追加
+POLICY_DROP_NEWEST = "DROP_NEWEST"  # 追加しようとした要素を捨てる
+POLICY_COALESCE = "COALESCE"        # 最後の要素に結合
+POLICY_BLOCK = "BLOCK"              # 空きが出るまで待つ
+
+QUEUE_POLICIES = (POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_COALESCE, POLICY_BLOCK)
+
+# 結合した区間の上限（Whisperが一度に扱える30秒を超える分は古い側を捨てる）
+MAX_COALESCED_SAMPLES = 16000 * 30
+
+
+###########################################
+#   　 　　上限付きの受け渡しキュー
+###########################################
+class BoundedQueue(queue.Queue):
+    """上限を超えたときの扱いを選べるキュー"""
+
+    def __init__(self, maxsize, policy=POLICY_DROP_OLDEST, coalesce=None):
+        super().__init__(maxsize=max(1, maxsize))
+        if policy == POLICY_COALESCE and coalesce is None:
+            policy = POLICY_DROP_OLDEST
+        self.policy = policy
+        self.coalesce = coalesce          # (古い要素, 新しい要素) -> 結合した要素
+        self.dropped_count = 0
+        self.coalesced_count = 0
+
+    def offer(self, item, timeout=None):
+        """ポリシーに従って要素を追加
+
+        破棄・結合した場合も処理済みとしてTrueを返し、BLOCKで時間切れの場合のみFalseを返す。
+        """
+        if self.policy == POLICY_BLOCK:
+            try:
+                self.put(item, timeout=timeout)
+                return True
+            except queue.Full:
+                return False
+
+        with self.not_full:
+            if self._qsize() < self.maxsize:
+                self._put(item)
+                self.unfinished_tasks += 1
+                self.not_empty.notify()
+                return True
+
+            if self.policy == POLICY_COALESCE:
+                self.queue[-1] = self.coalesce(self.queue[-1], item)
+                self.coalesced_count += 1
+            elif self.policy == POLICY_DROP_NEWEST:
+                self.dropped_count += 1
+            else:
+                self.queue.popleft()
+                self.queue.append(item)
+                self.dropped_count += 1
+            return True
+
+    def clear(self):
+        """キューを空にする"""
+        with self.mutex:
+            self.queue.clear()
+            self.unfinished_tasks = 0
+            self.not_full.notify_all()
+
+
+def merge_audio_windows(older, newer, max_samples=MAX_COALESCED_SAMPLES):
+    """推論待ちの区間を1つに結合（COALESCEポリシー用）
+
+    推論が追いつかない間も結合した区間が伸び続けないよう、max_samplesを超えた分は古い側を捨てる。
+    """
+    audio = np.concatenate((older["audio"], newer["audio"]))
+    if len(audio) > max_samples:
+        audio = audio[-max_samples:]
+    return {
+        "audio": audio,
+        "captured_at": older["captured_at"],
+        "noise_floor": newer["noise_floor"],
+    }
+
+
+# 区間の切り出し方
+SEGMENT_MODE_FIXED = "FIXED"        # 一定長ごとに区切る
+SEGMENT_MODE_ENDPOINT = "ENDPOINT"  # 発話の開始〜終了で区切る
+
+
+###########################################
+#   　 　　認識区間の切り出し
+###########################################
+class SpeechSegmenter:
+    """リングバッファの未読データから認識に渡す区間を切り出す"""
+
+    def __init__(self, ring_buffer, mode=SEGMENT_MODE_FIXED, window_samples=1024 * 32,
+                 threshold=0.5, silence_ms=400, max_segment_seconds=8.0, pre_roll_ms=300,
+                 noise_floor=None):
+        self.ring_buffer = ring_buffer
+        self.mode = mode
+        self.window_samples = window_samples
+        sample_rate = ring_buffer.sample_rate
+        # 発話終了の判定はVADのハングオーバー（無音が続く時間）で行う
+        # ノイズフロアはキャリブレーション結果があればその値から始める
+        self.vad = FrameVAD(sample_rate=sample_rate, min_level=threshold, hangover_ms=silence_ms)
+        if noise_floor:
+            self.vad.reset(noise_floor=noise_floor)
+        self.frame_samples = self.vad.frame_samples
+        # 発話開始の直前を含めることで、閾値を超える前の子音が欠けないようにする
+        self.pre_roll_samples = int(sample_rate * pre_roll_ms / 1000)
+        # 区間はリングバッファから取り出すため、容量を超える長さにはできない
+        self.max_segment_samples = min(
+            int(sample_rate * max_segment_seconds),
+            ring_buffer.capacity - self.pre_roll_samples - self.frame_samples
+        )
+
+        self.segment_start = None    # 発話区間の開始位置（累計位置）
+        self.last_segment_end = 0    # 直前に切り出した区間の終端（プリロールが重ならないように）
+        self.skipped_windows = 0     # 音声を含まないため認識しなかった固定長区間の数
+
+    def process(self):
+        """未読データを処理し、確定した区間（float32配列）のリストを返す"""
+        if self.mode == SEGMENT_MODE_ENDPOINT:
+            return self._process_endpoint()
+        return self._process_fixed()
+
+    def _process_fixed(self):
+        """一定長（約2秒）ごとに区間を切り出し、音声を含む区間だけを返す"""
+        segments = []
+        while self.ring_buffer.available() >= self.window_samples:
+            window = self.ring_buffer.read(self.window_samples, copy=True)
+            if self.vad.process(window).any():
+                segments.append(window)
+            else:
+                self.skipped_windows += 1
+        return segments
+
+    def _process_endpoint(self):
+        """発話の開始で区間を開き、VADが発話終了と判定したら（または最大長で）閉じる"""
+        segments = []
+        ring = self.ring_buffer
+        frame = self.frame_samples
+        count = ring.available() // frame * frame
+        if count == 0:
+            return segments
+
+        block_start = ring.read_position
+        flags = self.vad.process(ring.read(count))
+        for index, voiced in enumerate(flags):
+            frame_start = block_start + index * frame
+            frame_end = frame_start + frame
+
+            if voiced and self.segment_start is None:
+                self.segment_start = max(
+                    frame_start - self.pre_roll_samples,
+                    self.last_segment_end,
+                    ring.oldest_position()
+                )
+            elif not voiced and self.segment_start is not None:
+                # VADのハングオーバーが切れたので発話終了
+                segments.append(ring.get_range(self.segment_start, frame_start, copy=True))
+                self.last_segment_end = frame_start
+                self.segment_start = None
+                continue
+
+            # 長すぎる発話は最大長で区切り、続きを次の区間とする
+            if self.segment_start is not None and frame_end - self.segment_start >= self.max_segment_samples:
+                segments.append(ring.get_range(self.segment_start, frame_end, copy=True))
+                self.last_segment_end = frame_end
+                self.segment_start = frame_end
+        return segments
+
+    def reset(self):
+        """途中の区間を破棄"""
+        self.segment_start = None
+        self.last_segment_end = self.ring_buffer.write_position
+        self.vad.reset()
@@ -0,0 +1,269 @@
+"""
+音声コマンドの検索用インデックス
+command.jsonから言語ごとに「正規化したキー → コマンド」の表を一度だけ作り、
+認識のたびにJSONの読み込みやCollectionPropertyの再構築を行わないようにする
+"""
+import ast
+import hashlib
+import json
+import os
+import string
+import threading
+from collections import namedtuple
+
+from .kana import normalize_kana
+from .command_matcher import CommandMatcher, DEFAULT_FUZZY_MAX_RATIO
+
+COMMAND_JSON_PATH = os.path.join(os.path.dirname(__file__), "command.json")
+
+# 照合前に取り除く句読点
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation + '。、．，！？')
+
+# インデックスに登録するコマンド（codeはインデックス作成時にコンパイル済み）
+# priorityは同じ長さのキーが重なって一致したときの優先度（JSONで省略時は0）
+CommandRecord = namedtuple(
+    "CommandRecord",
+    ("language", "key", "normalized_key", "description", "normalized_description",
+     "code", "compiled", "error", "priority"),
+)
+
+
+######################################
+#  　 　　テキストの正規化
+######################################
+def is_japanese_language(language_name):
+    """日本語のコマンドか（カナに揃えてから照合する）"""
+    return language_name == "日本語"
+
+def uses_word_boundaries(language_name):
+    """単語を空白で区切る言語か（日本語・中国語以外。あいまい照合を単語単位で行う）"""
+    name = language_name.lower()
+    if is_japanese_language(language_name) or name in ('ja', 'zh'):
+        return False
+    return not any(hint in name for hint in ('日本', '中', 'japanese', 'chinese'))
+
+def normalize_command_text(text, language_name):
+    """照合用にテキストを正規化（小文字化・日本語はカタカナ化と表記ゆれの吸収・句読点の削除）"""
+    text = text.lower()
+    if is_japanese_language(language_name):
+        text = normalize_kana(text)
+    return text.translate(PUNCTUATION_TABLE)
+
+def detect_command_language(text, available_languages):
+    """テキストから言語を簡易判定し、インデックスの言語名に対応させる"""
+    # 日本語文字（ひらがな、カタカナ、漢字）が含まれているかチェック
+    hiragana_present = any('\u3040' <= char <= '\u309F' for char in text)
+    katakana_present = any('\u30A0' <= char <= '\u30FF' for char in text)
+    chinese_chars = any('\u4E00' <= char <= '\u9FAF' for char in text)
+
+    # 日本語判定
+    if hiragana_present or katakana_present:
+        for lang_name in available_languages:
+            if '日本' in lang_name or 'japanese' in lang_name.lower() or 'ja' == lang_name.lower():
+                return lang_name
+        return "日本語"  # フォールバック
+
+    # 中国語判定
+    if chinese_chars:
+        for lang_name in available_languages:
+            if '中国' in lang_name or 'chinese' in lang_name.lower() or 'zh' == lang_name.lower():
+                return lang_name
+        return "中国語"  # フォールバック
+
+    # 英語判定（デフォルト）
+    for lang_name in available_languages:
+        if 'english' in lang_name.lower() or 'en' == lang_name.lower() or '英語' in lang_name:
+            return lang_name
+    # 見つからない場合は最初の言語を使用
+    if available_languages:
+        return available_languages[0]
+    return "英語"  # フォールバック
+
+
+######################################
+#  　 　　コードのコンパイル
+######################################
+# コンパイル結果（構文木は安全性の検査で再利用する）
+ParsedCode = namedtuple("ParsedCode", ("digest", "tree", "compiled", "error"))
+
+_code_cache = {}   # コードのハッシュ -> ParsedCode
+_code_cache_lock = threading.Lock()
+
+def code_hash(code):
+    """コードの内容のハッシュ（キャッシュのキー）"""
+    return hashlib.sha1(code.encode('utf-8')).hexdigest()
+
+def parse_command_code(code):
+    """コードを構文木に変換してコンパイル（同じ内容のコードは一度だけ処理する）"""
+    digest = code_hash(code)
+    cached = _code_cache.get(digest)
+    if cached is not None:
+        return cached
+    try:
+        tree = ast.parse(code, "<voice command>", "exec")
+        parsed = ParsedCode(digest, tree, compile(tree, "<voice command>", "exec"), None)
+    except SyntaxError as e:
+        parsed = ParsedCode(digest, None, None, f"構文エラー（{e.lineno}行目）: {e.msg}")
+    with _code_cache_lock:
+        _code_cache[digest] = parsed
+    return parsed
+
+def compile_command_code(code):
+    """コマンドのコードをコンパイル（戻り値: (コードオブジェクト, エラーメッセージ)）
+
+    同じ内容のコードは一度だけコンパイルし、以降はキャッシュしたコードオブジェクトを返す。
+    空のコードは(None, None)。
+    """
+    if not code or not code.strip():
+        return None, None
+    parsed = parse_command_code(code)
+    return parsed.compiled, parsed.error
+
+
+######################################
+#  　 　　インデックスの作成
+######################################
+def build_command_records(data):
+    """JSONと同じ形式のデータから言語ごとのコマンド一覧を作成"""
+    languages = {}
+    for lang_name, commands in data.items():
+        records = []
+        for cmd_key, cmd_val in commands.items():
+            # 新形式: description/code両方を持つ / 旧形式: 文字列のみ
+            priority = 0
+            if isinstance(cmd_val, dict):
+                description = str(cmd_val.get("description", ""))
+                code = str(cmd_val.get("code", ""))
+                priority = int(cmd_val.get("priority", 0))
+            else:
+                description = str(cmd_val)
+                code = ""
+            key = str(cmd_key)
+            compiled, error = compile_command_code(code)
+            if error:
+                # 音声で呼び出す前に、読み込んだ時点で知らせる
+                print(f"コマンド【{lang_name}】'{key}' のコードに{error}")
+            records.append(CommandRecord(
+                lang_name, key, normalize_command_text(key, lang_name),
+                description, normalize_command_text(description, lang_name),
+                code, compiled, error, priority
+            ))
+        languages[lang_name] = records
+    return languages
+
+def file_signature(path):
+    """変更検出用のファイル情報（更新時刻・サイズ）。ファイルがなければNone"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+###########################################
+#   　 　　コマンドインデックス
+###########################################
+class CommandIndex:
+    """言語別のコマンドインデックス（シングルトン）
+
+    command.jsonの更新時刻・サイズが変わったときだけ内容のハッシュを計算し、
+    ハッシュも変わっていた場合にのみ作り直す。
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'):
+            return
+        self.initialized = True
+
+        self.path = COMMAND_JSON_PATH
+        self.languages = {}       # 言語名 -> [CommandRecord, ...]
+        self.matchers = {}        # 言語名 -> CommandMatcher
+        self.fuzzy_max_ratio = DEFAULT_FUZZY_MAX_RATIO  # あいまい照合で許す編集距離の割合
+        self.signature = None     # 作成元ファイルの(更新時刻, サイズ)
+        self.content_hash = None  # 作成元ファイルの内容のハッシュ
+        self.build_count = 0      # インデックスを作り直した回数
+
+    def ensure_current(self):
+        """command.jsonが変更されていればインデックスを作り直す（変更がなければstat 1回のみ）"""
+        signature = file_signature(self.path)
+        if signature is None or signature == self.signature:
+            return self
+        with self._lock:
+            try:
+                with open(self.path, 'rb') as file:
+                    raw = file.read()
+            except OSError as e:
+                print(f"コマンドインデックスの読み込みエラー: {e}")
+                return self
+            content_hash = hashlib.sha1(raw).hexdigest()
+            self.signature = signature
+            if content_hash == self.content_hash:
+                return self  # 保存し直しただけで内容は同じ
+            try:
+                data = json.loads(raw.decode('utf-8'))
+            except (ValueError, UnicodeDecodeError) as e:
+                print(f"コマンドインデックスのJSON解析エラー: {e}")
+                return self
+            self._replace(data)
+            self.content_hash = content_hash
+            print(f"コマンドインデックスを作成しました（{len(self.languages)}言語）")
+        return self
+
+    def load_data(self, data):
+        """編集中のコマンド（JSONと同じ形式）からインデックスを作り直す"""
+        with self._lock:
+            self._replace(data)
+            # 作成元のファイルの状態は変えない（ファイルが保存されたら次回そちらを読み直す）
+
+    def invalidate(self):
+        """次回の参照時にcommand.jsonから作り直す"""
+        with self._lock:
+            self.signature = None
+            self.content_hash = None
+
+    def _replace(self, data):
+        # 参照の差し替えだけで切り替える（照合中の呼び出し側は古い表を使い切れる）
+        languages = build_command_records(data)
+        self.matchers = self._build_matchers(languages)
+        self.languages = languages
+        self.build_count += 1
+
+    def _build_matchers(self, languages):
+        return {
+            name: CommandMatcher(records, self.fuzzy_max_ratio, uses_word_boundaries(name))
+            for name, records in languages.items()
+        }
+
+    def set_fuzzy_ratio(self, ratio):
+        """あいまい照合の許容距離を変更（各言語のあいまい照合の表だけを作り直す）"""
+        if ratio == self.fuzzy_max_ratio:
+            return
+        with self._lock:
+            self.fuzzy_max_ratio = ratio
+            for matcher in self.matchers.values():
+                matcher.set_fuzzy_ratio(ratio)
+
+    def language_names(self):
+        """登録されている言語名の一覧"""
+        return list(self.languages.keys())
+
+    def commands(self, language_name):
+        """指定言語のコマンド一覧"""
+        return self.languages.get(language_name, [])
+
+    def matcher(self, language_name):
+        """指定言語の照合器（言語が登録されていなければNone）"""
+        return self.matchers.get(language_name)
+
+
+# グローバルインスタンス
+command_index = CommandIndex()
@@ -0,0 +1,437 @@
+"""
+音声コマンドの照合
+言語ごとに全コマンドキーからAho-Corasickのオートマトンを作り、
+認識テキストを1回なぞるだけで含まれるすべてのキーを位置付きで見つける。
+完全一致がない場合は、2文字組（bigram）で候補を絞ってから
+ビット並列の編集距離（Myers）であいまい照合し、
+それでも見つからなければ説明文も含めた文字n-gramのTF-IDFで類似度を比べる
+"""
+from collections import defaultdict, deque
+
+import numpy as np
+
+DEFAULT_FUZZY_MAX_RATIO = 0.25  # キーの長さに対して許す編集距離の割合
+FUZZY_MIN_KEY_LENGTH = 5        # これより短いキーはあいまい照合しない（完全一致のみ）
+DESCRIPTION_NGRAM_SIZES = (2, 3)  # 説明文の照合に使う文字n-gramの長さ
+DESCRIPTION_MIN_MARGIN = 0.1      # 説明文の照合で、2番目の候補との類似度に必要な差
+
+
+###########################################
+#   　 　　Aho-Corasickオートマトン
+###########################################
+class AhoCorasick:
+    """複数のキーを同時に検索するオートマトン（検索はテキスト長に比例）"""
+
+    def __init__(self, patterns):
+        self.lengths = [len(pattern) for pattern in patterns]
+        self._goto = [{}]     # ノード -> {文字: 次のノード}
+        self._fail = [0]      # ノード -> 失敗時に移るノード
+        self._output = [()]   # ノード -> このノードで終わるキーの番号
+
+        for index, pattern in enumerate(patterns):
+            if not pattern:
+                continue  # 空のキーはどのテキストにも一致してしまうため登録しない
+            node = 0
+            for char in pattern:
+                child = self._goto[node].get(char)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._goto[node][char] = child
+                node = child
+            self._output[node] += (index,)
+
+        # 幅優先で失敗遷移を設定し、失敗先で終わるキーも出力に含める
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] += self._output[self._fail[child]]
+
+    def find_all(self, text):
+        """テキスト中のすべての出現を(開始位置, 終了位置, キー番号)のリストで返す"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        lengths = self.lengths
+        matches = []
+        node = 0
+        for position, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for index in output[node]:
+                matches.append((position - lengths[index], position, index))
+        return matches
+
+
+###########################################
+#   　 　　ビット並列の編集距離（Myers）
+###########################################
+def pattern_masks(pattern):
+    """文字ごとに、キー内で出現する位置のビットを立てた表"""
+    masks = {}
+    for position, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    return masks
+
+def myers_search_distance(masks, length, text):
+    """キーとテキスト中の任意の部分文字列との最小編集距離
+
+    テキストの開始位置を自由にする（部分文字列として探す）Myersのビット並列法で、
+    1文字あたり定数回の整数演算で計算する。
+    """
+    if length == 0:
+        return 0
+    full = (1 << length) - 1
+    high = 1 << (length - 1)
+    pv = full
+    mv = 0
+    score = length
+    best = length
+    for char in text:
+        eq = masks.get(char, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        # テキストの開始位置は自由なので、最上段（空のキー）には距離を加えない
+        ph = (ph << 1) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+        if score < best:
+            best = score
+            if best == 0:
+                break  # これ以上小さくならない
+    return best
+
+def myers_positions(masks, length, text, limit, anchored=False):
+    """キーとの編集距離がlimit以下になるテキストの位置を(終了位置, 編集距離)のリストで返す
+
+    anchored=Falseでは一致の開始位置を自由にし（myers_search_distanceと同じ）、
+    Trueではテキストの先頭から一致させる（終了位置までの全体との距離）。
+    """
+    if length == 0:
+        return []
+    full = (1 << length) - 1
+    high = 1 << (length - 1)
+    carry = 1 if anchored else 0  # 先頭から一致させる場合は最上段も1文字ごとに距離が1増える
+    pv = full
+    mv = 0
+    score = length
+    positions = []
+    for position, char in enumerate(text, 1):
+        eq = masks.get(char, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = (mv | ~(xh | pv)) & full
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | carry) & full
+        mh = (mh << 1) & full
+        pv = (mh | ~(xv | ph)) & full
+        mv = ph & xv
+        if score <= limit:
+            positions.append((position, score))
+    return positions
+
+def is_word_start(text, position):
+    """単語の先頭の位置か（直前が先頭か空白で、その位置は空白でない）"""
+    if position >= len(text) or text[position].isspace():
+        return False
+    return position == 0 or text[position - 1].isspace()
+
+def is_word_end(text, position):
+    """単語の末尾の位置か（直後が末尾か空白で、直前は空白でない）"""
+    if position <= 0 or text[position - 1].isspace():
+        return False
+    return position == len(text) or text[position].isspace()
+
+def text_bigrams(text):
+    """2文字組の集合"""
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+###########################################
+#   　 　　あいまい照合
+###########################################
+class FuzzyMatcher:
+    """編集距離によるあいまい照合（bigramの転置索引で候補を絞る）
+
+    k回の編集で失われるbigramは高々2k個なので、キーのbigramのうち
+    テキストに含まれる数が (キーのbigram数 - 2k) 未満のキーは照合しなくてよい。
+    一致する部分の長さはキーの長さ + k以下なので、その長さの範囲に必要数のbigramが
+    集まっていないキーも照合しない（長いテキストで共通の単語を持つキーを除くため）。
+    単語を空白で区切る言語（word_boundaries=True）では、キーを単語の途中と照合しないよう
+    一致の両端が単語の境界にあるものだけを採用する。
+    """
+
+    def __init__(self, keys, max_ratio=DEFAULT_FUZZY_MAX_RATIO, word_boundaries=False,
+                 min_key_length=FUZZY_MIN_KEY_LENGTH):
+        self.max_ratio = max_ratio
+        self.word_boundaries = word_boundaries
+        self.min_key_length = min_key_length
+        self.keys = list(keys)
+        self.masks = [pattern_masks(key) for key in self.keys]
+        # 一致の開始位置を終了位置から逆向きに探すための、反転したキーの表
+        self.reverse_masks = [pattern_masks(key[::-1]) for key in self.keys] if word_boundaries else None
+        self.limits = [self.max_distance(len(key)) for key in self.keys]  # キーごとの許容編集距離
+        self.postings = defaultdict(list)   # bigram -> そのbigramを含むキー番号
+        self.grams = []                     # キーごとのbigram
+        self.required = []                  # 候補になるために必要な共通bigram数
+        self.always = []                    # 必要数が0以下（絞り込みができない）キー
+        for index, key in enumerate(self.keys):
+            grams = text_bigrams(key)
+            self.grams.append(grams)
+            if self.limits[index] == 0:
+                self.required.append(0)
+                continue  # 完全一致のみ（あいまい照合の対象外）
+            for gram in grams:
+                self.postings[gram].append(index)
+            required = len(grams) - 2 * self.limits[index]
+            self.required.append(required)
+            if required <= 0:
+                self.always.append(index)
+        # 照合時にまとめて数えるため、numpy配列にしておく
+        self.postings = {gram: np.array(indices, dtype=np.int32) for gram, indices in self.postings.items()}
+        self.required = np.array(self.required, dtype=np.int32)
+
+    def max_distance(self, length):
+        """キーの長さに応じた許容編集距離（短いキーは0）"""
+        if length < self.min_key_length:
+            return 0
+        return int(length * self.max_ratio)
+
+    def candidates(self, text):
+        """共通bigramの数と位置で絞り込んだ候補を(キー番号, 照合する範囲の開始, 終了)のリストで返す"""
+        occurrences = defaultdict(list)   # テキストのbigram -> 現れた位置
+        for position in range(len(text) - 1):
+            occurrences[text[position:position + 2]].append(position)
+        found = []
+        lists = [self.postings[gram] for gram in occurrences if gram in self.postings]
+        if lists:
+            # 共通bigramの数をまとめて数え、必要数に達したキーだけ位置を確かめる
+            # （必要数が0以下のキーはalwaysで追加する）
+            counts = np.bincount(np.concatenate(lists), minlength=len(self.keys))
+            passed = np.flatnonzero((counts >= self.required) & (self.required > 0))
+            for index in passed.tolist():
+                region = self._region(index, occurrences, len(text))
+                if region is not None:
+                    found.append((index,) + region)
+        found.extend((index, 0, len(text)) for index in self.always)
+        return found
+
+    def _region(self, index, occurrences, text_length):
+        """必要数のbigramがキーの長さ + kの範囲に集まっている部分を含む照合範囲（なければNone）"""
+        required = self.required[index]
+        length = len(self.keys[index]) + self.limits[index]  # 一致する部分の最大の長さ
+        positions = sorted(position for gram in self.grams[index] for position in occurrences.get(gram, ()))
+        low = high = None
+        for start in range(len(positions) - required + 1):
+            first = positions[start]
+            last = positions[start + required - 1]
+            if last + 2 - first > length:
+                continue
+            # 一致する部分はこの範囲のbigramをすべて含み、長さはlength以下
+            low = last + 2 - length if low is None else min(low, last + 2 - length)
+            high = first + length if high is None else max(high, first + length)
+        if low is None:
+            return None
+        return max(low, 0), min(high, text_length)
+
+    def word_distance(self, index, text, limit, low=0, high=None):
+        """両端が単語の境界にある部分文字列との最小編集距離（limit以下がなければlimit + 1）
+
+        開始位置を自由にしたMyersで照合範囲（text[low:high]）を1回なぞって境界で終わる一致を見つけ、
+        その終了位置から反転したキーで逆向きに、境界から始まる一致を探す。
+        """
+        length = len(self.keys[index])
+        best = limit + 1
+        for end, distance in myers_positions(self.masks[index], length, text[low:high], limit):
+            end += low
+            if distance >= best or not is_word_end(text, end):
+                continue
+            # 一致の長さはキーの長さ + limitを超えない
+            head = max(end - length - limit, low)
+            prefix = text[head:end][::-1]
+            for back, total in myers_positions(self.reverse_masks[index], length, prefix, limit, anchored=True):
+                if total < best and is_word_start(text, end - back):
+                    best = total
+                    if best == 0:
+                        return 0
+        return best
+
+    def search(self, text):
+        """許容距離以内のキーを(キー番号, 編集距離, 信頼度)のリストで返す"""
+        results = []
+        for index, low, high in self.candidates(text):
+            length = len(self.keys[index])
+            limit = self.limits[index]
+            if self.word_boundaries:
+                distance = self.word_distance(index, text, limit, low, high)
+            else:
+                distance = myers_search_distance(self.masks[index], length, text[low:high])
+            if distance <= limit:
+                results.append((index, distance, 1.0 - distance / length))
+        return results
+
+
+###########################################
+#   　 　　説明文を含めた類似度照合
+###########################################
+def char_ngrams(text, sizes=DESCRIPTION_NGRAM_SIZES):
+    """文字n-gramの出現回数"""
+    counts = defaultdict(int)
+    for size in sizes:
+        for i in range(len(text) - size + 1):
+            counts[text[i:i + size]] += 1
+    return counts
+
+class DescriptionMatcher:
+    """キーと説明文の文字n-gramによるTF-IDF（疎行列をnumpy配列で保持）
+
+    各コマンドの行ベクトルはL2正規化済みなので、認識テキストのベクトルとの
+    内積（コサイン類似度）を全コマンド分まとめて1回の演算で求められる。
+    """
+
+    def __init__(self, texts):
+        self.count = len(texts)
+        self.vocabulary = {}   # n-gram -> 列番号
+        rows, columns, values = [], [], []
+        document_frequency = defaultdict(int)
+        grams_per_text = [char_ngrams(text) for text in texts]
+        for grams in grams_per_text:
+            for gram in grams:
+                document_frequency[gram] += 1
+        for gram in document_frequency:
+            self.vocabulary[gram] = len(self.vocabulary)
+
+        # 多くのコマンドに共通するn-gramほど重みを下げる（平滑化したIDF）
+        self.idf = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for gram, frequency in document_frequency.items():
+            self.idf[self.vocabulary[gram]] = np.log((1 + self.count) / (1 + frequency)) + 1.0
+
+        for row, grams in enumerate(grams_per_text):
+            for gram, count in grams.items():
+                rows.append(row)
+                columns.append(self.vocabulary[gram])
+                values.append(count)
+        self.rows = np.array(rows, dtype=np.int32)
+        self.columns = np.array(columns, dtype=np.int32)
+        values = np.array(values, dtype=np.float32) * self.idf[self.columns]
+        norms = np.sqrt(np.bincount(self.rows, weights=values * values, minlength=self.count))
+        self.values = (values / np.maximum(norms[self.rows], 1e-12)).astype(np.float32)
+
+    def scores(self, text):
+        """全コマンドとのコサイン類似度"""
+        query = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for gram, count in char_ngrams(text).items():
+            column = self.vocabulary.get(gram)
+            if column is not None:
+                query[column] = count * self.idf[column]
+        norm = float(np.linalg.norm(query))
+        if norm == 0.0 or self.count == 0:
+            return np.zeros(self.count, dtype=np.float32)
+        query /= norm
+        return np.bincount(self.rows, weights=self.values * query[self.columns], minlength=self.count)
+
+    def best(self, text):
+        """最も類似度が高いコマンドの(番号, 類似度, 2番目の類似度)。候補がなければNone"""
+        if self.count == 0:
+            return None
+        scores = self.scores(text)
+        index = int(np.argmax(scores))
+        runner_up = float(np.partition(scores, -2)[-2]) if self.count > 1 else 0.0
+        return index, float(scores[index]), runner_up
+
+
+###########################################
+#   　 　　コマンドの照合
+###########################################
+class CommandMatcher:
+    """1言語分のコマンドの照合器
+
+    重なる一致は「長いキー → 優先度が高い → ファイル内で先のもの」の順で採用する。
+    word_boundariesは単語を空白で区切る言語か（あいまい照合を単語単位で行う）。
+    """
+
+    def __init__(self, records, fuzzy_max_ratio=DEFAULT_FUZZY_MAX_RATIO, word_boundaries=False):
+        self.records = list(records)
+        self.word_boundaries = word_boundaries
+        keys = [record.normalized_key for record in self.records]
+        self.automaton = AhoCorasick(keys)
+        self.fuzzy = FuzzyMatcher(keys, fuzzy_max_ratio, word_boundaries)
+        self.description = DescriptionMatcher([
+            f"{record.normalized_key} {record.normalized_description}" for record in self.records
+        ])
+
+    def set_fuzzy_ratio(self, ratio):
+        """あいまい照合の許容距離を変更（オートマトンや説明文の表は作り直さない）"""
+        if ratio != self.fuzzy.max_ratio:
+            self.fuzzy = FuzzyMatcher(self.fuzzy.keys, ratio, self.word_boundaries)
+
+    def _rank(self, match):
+        start, end, index = match
+        return (-(end - start), -self.records[index].priority, index, start)
+
+    def match_all(self, text):
+        """重ならない一致をテキスト中の位置順に(コマンド, 開始位置, 終了位置)のリストで返す"""
+        taken = []
+        for start, end, index in sorted(self.automaton.find_all(text), key=self._rank):
+            if all(end <= other_start or start >= other_end for other_start, other_end, _ in taken):
+                taken.append((start, end, index))
+        taken.sort()
+        return [(self.records[index], start, end) for start, end, index in taken]
+
+    def best_match(self, text):
+        """最も優先されるコマンドを1つ返す（一致しなければNone）"""
+        matches = self.automaton.find_all(text)
+        if not matches:
+            return None
+        start, end, index = min(matches, key=self._rank)
+        return self.records[index]
+
+    def fuzzy_match(self, text, min_confidence=0.0):
+        """完全一致がないときのあいまい照合（戻り値: (コマンド, 信頼度) または None）
+
+        信頼度が高い → キーが長い → 優先度が高い → ファイル内で先のもの、の順で採用する。
+        """
+        best = None
+        for index, distance, confidence in self.fuzzy.search(text):
+            if confidence < min_confidence:
+                continue
+            rank = (-confidence, -len(self.fuzzy.keys[index]), -self.records[index].priority, index)
+            if best is None or rank < best[0]:
+                best = (rank, index, confidence)
+        if best is None:
+            return None
+        return self.records[best[1]], best[2]
+
+    def description_match(self, text, min_score, min_margin=DESCRIPTION_MIN_MARGIN):
+        """キーと説明文のTF-IDFによる照合（戻り値: (コマンド, 類似度) または None）
+
+        どちらとも取れる言い換えで誤って実行しないよう、2番目の候補と類似度に差がある場合のみ採用する。
+        """
+        best = self.description.best(text)
+        if best is None:
+            return None
+        index, score, runner_up = best
+        if score < min_score or score - runner_up < min_margin:
+            return None
+        return self.records[index], score
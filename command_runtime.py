@@ -0,0 +1,119 @@
+"""
+音声コマンドの実行環境
+実行に渡すグローバル名前空間はセッション中に一度だけ作り、コマンドごとに浅いコピーを渡す。
+bmesh・mathutils・numpyは最初に使われたときにimportし、コマンドごとの実行時間を記録する
+"""
+import builtins
+import importlib
+import math
+import random
+import threading
+import time
+
+import bpy
+
+SLOW_COMMAND_SECONDS = 0.1  # これより時間のかかったコマンドはコンソールに知らせる
+
+
+###########################################
+#   　 　　遅延importのモジュール
+###########################################
+class LazyModule:
+    """最初に属性へアクセスしたときにimportするモジュールの代理"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self._load(), attribute)
+
+    def __repr__(self):
+        state = "読み込み済み" if self._module is not None else "未読み込み"
+        return f"<LazyModule {self._name}（{state}）>"
+
+
+###########################################
+#   　 　　実行環境
+###########################################
+class CommandEnvironment:
+    """コマンド実行用の名前空間と実行時間の記録（シングルトン）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'):
+            return
+        self.initialized = True
+
+        self._namespace = None
+        self.timings = {}   # コマンド名 -> {"count", "total", "max", "last"}
+
+    def namespace(self):
+        """セッション共通の名前空間（初回のみ作成）"""
+        if self._namespace is None:
+            # 入れるモジュールはcommand_securityのDEFAULT_ALLOWED_IMPORTSと揃える
+            self._namespace = {
+                '__builtins__': builtins,
+                '__name__': '__voice_command__',
+                'bpy': bpy,
+                'math': math,
+                'random': random,
+                # 読み込みに時間のかかるモジュールは使われたときにimportする
+                'bmesh': LazyModule('bmesh'),
+                'mathutils': LazyModule('mathutils'),
+                'numpy': LazyModule('numpy'),
+                'np': LazyModule('numpy'),
+            }
+        return self._namespace
+
+    def new_globals(self):
+        """コマンド1回分の名前空間（共通の名前空間の浅いコピー）
+
+        コマンドが定義した変数はコピー側にだけ残り、共通の名前空間や他のコマンドには影響しない。
+        """
+        return dict(self.namespace())
+
+    def execute(self, name, compiled):
+        """コンパイル済みのコードを実行し、実行時間を記録（例外は呼び出し側に伝える）"""
+        start = time.perf_counter()
+        try:
+            exec(compiled, self.new_globals())
+        finally:
+            elapsed = time.perf_counter() - start
+            self._record(name, elapsed)
+        return elapsed
+
+    def _record(self, name, elapsed):
+        timing = self.timings.get(name)
+        if timing is None:
+            timing = self.timings[name] = {"count": 0, "total": 0.0, "max": 0.0, "last": 0.0}
+        timing["count"] += 1
+        timing["total"] += elapsed
+        timing["max"] = max(timing["max"], elapsed)
+        timing["last"] = elapsed
+        if elapsed >= SLOW_COMMAND_SECONDS:
+            print(f"コマンド '{name}' の実行に {elapsed * 1000:.0f} ms かかりました")
+
+    def slowest(self):
+        """平均実行時間が最も長いコマンド（記録がなければNone）"""
+        if not self.timings:
+            return None
+        name, timing = max(self.timings.items(), key=lambda item: item[1]["total"] / item[1]["count"])
+        return name, timing["total"] / timing["count"], timing["max"]
+
+
+# グローバルインスタンス
+command_environment = CommandEnvironment()
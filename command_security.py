@@ -0,0 +1,176 @@
+"""
+音声コマンドのコードの安全性チェック
+コードを構文木で検査し（文字列の部分一致ではなく）、import・属性アクセス・呼び出しを
+ポリシーと照合する。判定結果はコードのハッシュとポリシーの組ごとに記憶し、実行のたびに解析しない
+"""
+import ast
+import functools
+import threading
+
+from .command_index import parse_command_code
+
+# ポリシーの種類
+POLICY_STANDARD = "STANDARD"  # 許可したモジュール以外のimport・危険な組み込み関数・特殊属性を禁止
+POLICY_TRUSTED = "TRUSTED"    # 構文チェックのみ（自分で書いたコードだけを使う場合）
+
+# command_runtimeで名前空間に入れているモジュールと揃える
+DEFAULT_ALLOWED_IMPORTS = "bpy, bmesh, mathutils, math, random, numpy"
+
+# 呼び出しを禁止する組み込み関数
+BLOCKED_CALLS = frozenset({
+    "exec", "eval", "compile", "open", "__import__", "input",
+    "globals", "locals", "vars", "breakpoint", "exit", "quit",
+})
+
+# 名前として参照することを禁止するモジュール（importを経由しない持ち込みも防ぐ）
+BLOCKED_NAMES = frozenset({
+    "os", "sys", "subprocess", "shutil", "socket", "ctypes", "importlib", "builtins",
+})
+
+# 属性名を第2引数に取る組み込み関数（文字列リテラル以外や「_」で始まる属性は禁止）
+ATTRIBUTE_FUNCTIONS = frozenset({"getattr", "setattr", "delattr", "hasattr"})
+
+# コードを実行できるbpyの入口（テキストのモジュール化・ファイルの実行）
+BLOCKED_ATTRIBUTES = frozenset({"as_module", "execfile", "python_file_run"})
+
+
+######################################
+#  　 　　ポリシー
+######################################
+class CommandPolicy:
+    """コードの検査ポリシー（同じ設定のポリシーは同じkeyを持つ）"""
+
+    def __init__(self, level=POLICY_STANDARD, allowed_imports=()):
+        self.level = level
+        self.allowed_imports = frozenset(allowed_imports)
+        self.key = (level, self.allowed_imports)
+
+    def check(self, tree):
+        """構文木を検査し、違反があればその内容を返す（なければNone）"""
+        if self.level == POLICY_TRUSTED:
+            return None
+        visitor = _PolicyVisitor(self)
+        visitor.visit(tree)
+        return visitor.violation
+
+@functools.lru_cache(maxsize=16)
+def get_command_policy(level, allowed_imports_text):
+    """設定値からポリシーを取得（同じ設定なら同じオブジェクトを返す）"""
+    modules = [name.strip() for name in allowed_imports_text.split(",") if name.strip()]
+    return CommandPolicy(level, modules)
+
+def policy_from_props(command_props):
+    """bvc_command_propsの設定からポリシーを取得（メインスレッドから呼ぶ）"""
+    return get_command_policy(command_props.code_policy, command_props.allowed_imports)
+
+
+class _PolicyVisitor(ast.NodeVisitor):
+    """最初に見つかった違反を記録する"""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.violation = None
+
+    def _reject(self, node, message):
+        if self.violation is None:
+            self.violation = f"{getattr(node, 'lineno', '?')}行目: {message}"
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self._check_module(node, alias.name)
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        if node.level:
+            self._reject(node, "相対importは使用できません")
+        else:
+            self._check_module(node, node.module or "")
+        for alias in node.names:
+            # 許可したモジュール経由でも内部の名前（random._osなど）は持ち込ませない
+            if alias.name.startswith("_"):
+                self._reject(node, f"内部の名前 '{alias.name}' はimportできません")
+        self.generic_visit(node)
+
+    def _check_module(self, node, module):
+        parts = module.split(".")
+        if parts[0] not in self.policy.allowed_imports:
+            self._reject(node, f"'{module}' のimportは許可されていません")
+        elif any(part.startswith("_") for part in parts):
+            self._reject(node, f"内部のモジュール '{module}' はimportできません")
+
+    def _check_attribute(self, node, attribute):
+        # 特殊属性だけでなく、内部の属性（random._osなど）からも他のモジュールに辿れるため禁止
+        if attribute.startswith("_"):
+            self._reject(node, f"'_' で始まる属性 '{attribute}' にはアクセスできません")
+        elif attribute in BLOCKED_ATTRIBUTES:
+            self._reject(node, f"'{attribute}' は使用できません")
+
+    def visit_Attribute(self, node):
+        self._check_attribute(node, node.attr)
+        self.generic_visit(node)
+
+    def visit_Name(self, node):
+        # 禁止した関数は別名に代入して呼べないよう、呼び出し以外の参照も禁止する
+        # （属性名を取る関数の直接の呼び出しはvisit_Callで検査し、ここには来ない）
+        if node.id in BLOCKED_NAMES or node.id in BLOCKED_CALLS or node.id in ATTRIBUTE_FUNCTIONS:
+            self._reject(node, f"'{node.id}' は使用できません")
+        elif node.id.startswith("__") and node.id != "__name__":
+            self._reject(node, f"'{node.id}' は使用できません")
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name):
+            name = node.func.id
+            if name in BLOCKED_CALLS:
+                self._reject(node, f"'{name}()' は呼び出せません")
+            elif name in ATTRIBUTE_FUNCTIONS:
+                self._check_attribute_call(node, name)
+                # 関数名そのものはvisit_Nameで拒否されるため、引数だけを検査する
+                for argument in node.args:
+                    self.visit(argument)
+                return
+        self.generic_visit(node)
+
+    def _check_attribute_call(self, node, name):
+        # 属性名は位置引数の文字列リテラルに限る（*args・キーワード引数では中身を検査できない）
+        if node.keywords or any(isinstance(argument, ast.Starred) for argument in node.args):
+            self._reject(node, f"'{name}()' に*やキーワード引数は使用できません")
+        elif len(node.args) < 2:
+            self._reject(node, f"'{name}()' には対象と属性名を指定してください")
+        else:
+            attribute = node.args[1]
+            if not (isinstance(attribute, ast.Constant) and isinstance(attribute.value, str)):
+                self._reject(node, f"'{name}()' の属性名は文字列で直接指定してください")
+            else:
+                self._check_attribute(node, attribute.value)
+
+
+######################################
+#  　 　　検査と判定結果のキャッシュ
+######################################
+_verdicts = {}   # (コードのハッシュ, ポリシーのkey) -> 違反内容（問題なければNone）
+_verdicts_lock = threading.Lock()
+
+def check_command_code(code, policy):
+    """コードをポリシーで検査してコンパイル済みのコードを返す
+
+    戻り値: (コードオブジェクト, エラーメッセージ)。構文エラーまたはポリシー違反のときは
+    コードオブジェクトがNone。空のコードは(None, None)。
+    構文木・コンパイル結果・判定結果はいずれもキャッシュするため、2回目以降は解析しない。
+    """
+    if not code or not code.strip():
+        return None, None
+    parsed = parse_command_code(code)
+    if parsed.error:
+        return None, parsed.error
+
+    key = (parsed.digest, policy.key)
+    if key in _verdicts:
+        violation = _verdicts[key]
+    else:
+        violation = policy.check(parsed.tree)
+        with _verdicts_lock:
+            _verdicts[key] = violation
+    if violation:
+        return None, f"安全上の理由により実行できません（{violation}）"
+    return parsed.compiled, None
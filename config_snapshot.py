@@ -0,0 +1,42 @@
+"""
+録音・推論スレッドが参照する設定のスナップショット
+bpyのプロパティはメインスレッドでのみ読み、変更のたびに不変の設定オブジェクトを作り直して公開する。
+録音コールバックや推論スレッドは公開済みのオブジェクトを参照するだけなので、ロックもRNAへのアクセスも不要
+"""
+import itertools
+from collections import namedtuple
+
+# 録音・推論スレッドが使う設定（namedtupleなので生成後は変更できない）
+RecognitionConfig = namedtuple(
+    "RecognitionConfig",
+    (
+        "version",            # 公開するたびに増える番号（変更の検出用）
+        "volume_threshold",   # 音声とみなす音量
+        "language",           # 認識言語コード（Noneなら自動検出）
+        "device_name",        # 選択中のデバイス名
+        "compute_type",       # 推論の計算精度
+        "cpu_threads",        # 推論のスレッド数
+        "beam_size",          # デコード設定
+        "best_of",
+        "temperature",
+    ),
+    defaults=(0, 0.5, None, "未選択", "AUTO", 4, 5, 5, 0.0),
+)
+
+_versions = itertools.count(1)
+_current = RecognitionConfig()
+
+
+def get_config():
+    """公開中の設定を取得（どのスレッドからでも呼べる）"""
+    return _current
+
+def publish_config(**values):
+    """設定を作り直して公開（メインスレッドから呼ぶ）
+
+    参照の差し替えは1回の代入なので、読み出し側は古い設定か新しい設定の
+    どちらか一方を必ず完全な形で受け取る。
+    """
+    global _current
+    _current = _current._replace(version=next(_versions), **values)
+    return _current
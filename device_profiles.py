@@ -0,0 +1,105 @@
+"""
+録音デバイスごとのキャリブレーション結果（環境ノイズと推奨閾値）の管理
+デバイス名とホストAPIの組をキーとしてdevice_profiles.jsonに保存する
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from .vad import frame_features, DEFAULT_FRAME_SAMPLES
+
+DEVICE_PROFILES_PATH = os.path.join(os.path.dirname(__file__), "device_profiles.json")
+
+# 推奨閾値の下限・上限（volume_thresholdの範囲内に収める）
+MIN_PROPOSED_THRESHOLD = 0.01
+MAX_PROPOSED_THRESHOLD = 0.95
+
+_profiles_cache = None  # 読み込み済みのプロファイル（描画のたびにファイルを読まない）
+
+
+def device_profile_key(device_name, hostapi_name):
+    """プロファイルのキー（同名デバイスでもホストAPIが違えば別扱い）"""
+    return f"{hostapi_name}:{device_name}"
+
+
+######################################
+#  　 　　プロファイルの読み書き
+######################################
+def load_device_profiles():
+    """すべてのデバイスプロファイルを取得（初回のみファイルから読み込む）"""
+    global _profiles_cache
+    if _profiles_cache is None:
+        try:
+            with open(DEVICE_PROFILES_PATH, 'r', encoding='utf-8') as file:
+                _profiles_cache = json.load(file)
+        except FileNotFoundError:
+            _profiles_cache = {}
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"デバイスプロファイルの読み込みエラー: {e}")
+            _profiles_cache = {}
+    return _profiles_cache
+
+def get_device_profile(key):
+    """指定デバイスのプロファイルを取得（未キャリブレーションならNone）"""
+    return load_device_profiles().get(key)
+
+def save_device_profile(key, profile):
+    """デバイスプロファイルを保存"""
+    profiles = load_device_profiles()
+    profiles[key] = profile
+    try:
+        with open(DEVICE_PROFILES_PATH, 'w', encoding='utf-8') as file:
+            json.dump(profiles, file, ensure_ascii=False, indent=2)
+        return True
+    except OSError as e:
+        print(f"デバイスプロファイルの保存エラー: {e}")
+        return False
+
+
+######################################
+#  　 　　環境ノイズの解析
+######################################
+def analyze_room_tone(audio, sample_rate=16000, frame_samples=DEFAULT_FRAME_SAMPLES):
+    """無音時の録音からノイズ統計と推奨閾値を計算"""
+    energy, peak, zcr = frame_features(audio, frame_samples)
+    if len(energy) == 0:
+        raise ValueError("録音データが短すぎます")
+
+    rms = np.sqrt(energy)
+    peak_p95 = float(np.percentile(peak, 95))
+    peak_p99 = float(np.percentile(peak, 99))
+
+    def clip(value):
+        return float(np.clip(value, MIN_PROPOSED_THRESHOLD, MAX_PROPOSED_THRESHOLD))
+
+    return {
+        "noise_floor": float(np.mean(energy)),   # VADのノイズフロア初期値（フレームエネルギー）
+        "rms_mean": float(np.mean(rms)),
+        "rms_std": float(np.std(rms)),
+        "rms_db": float(20 * np.log10(max(np.mean(rms), 1e-9))),
+        "peak_p95": peak_p95,
+        "peak_p99": peak_p99,
+        "peak_max": float(np.max(peak)),
+        "zcr_mean": float(np.mean(zcr)),
+        "duration": len(audio) / sample_rate,
+        # 閾値はフレームのピークと比較するため、ノイズのピーク分布から余裕を持たせて決める
+        "proposed_thresholds": {
+            "sensitive": clip(peak_p95 * 1.2),
+            "standard": clip(peak_p99 * 1.5),
+            "conservative": clip(peak_p99 * 2.0),
+        },
+    }
+
+def build_device_profile(device_name, hostapi_name, stats, pre_roll_ms):
+    """解析結果からプロファイルを作成（推奨閾値は標準を採用）"""
+    return {
+        "device_name": device_name,
+        "hostapi": hostapi_name,
+        "volume_threshold": stats["proposed_thresholds"]["standard"],
+        "noise_floor": stats["noise_floor"],
+        "pre_roll_ms": pre_roll_ms,
+        "noise_stats": stats,
+        "calibrated_at": time.time(),
+    }
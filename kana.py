@@ -0,0 +1,99 @@
+"""
+音声コマンド照合用のカナ変換
+かな・英数字だけの部分は変換表で1回なぞるだけで処理し、
+漢字を含む部分だけをjanomeの形態素解析で読み（カタカナ）に変換する
+"""
+import functools
+import re
+import threading
+import unicodedata
+
+from janome.tokenizer import Tokenizer
+
+KATAKANA_CACHE_SIZE = 1024  # 読みを記憶しておくテキストの数
+
+# ひらがな→カタカナ（ぁ〜ゖ、ゝゞ）
+HIRAGANA_TO_KATAKANA = str.maketrans(
+    {chr(code): chr(code + 0x60) for code in range(0x3041, 0x3097)}
+    | {'ゝ': 'ヽ', 'ゞ': 'ヾ'}
+)
+
+# 照合用の表記ゆれの吸収（小書き文字→通常の文字、長音の異体→「ー」）
+# NFKCの後に適用するため、全角の「～」は半角の「~」として扱う
+KANA_FOLDING = str.maketrans({
+    'ァ': 'ア', 'ィ': 'イ', 'ゥ': 'ウ', 'ェ': 'エ', 'ォ': 'オ',
+    'ッ': 'ツ', 'ャ': 'ヤ', 'ュ': 'ユ', 'ョ': 'ヨ', 'ヮ': 'ワ',
+    'ヵ': 'カ', 'ヶ': 'ケ',
+    '〜': 'ー', '~': 'ー', '―': 'ー', '‐': 'ー', '−': 'ー',
+})
+
+# 漢字（々〆を含む）を含むかの判定と、形態素解析に渡す区切り（空白・句読点）
+KANJI_PATTERN = re.compile('[\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF\u3005\u3006]')
+SEGMENT_SEPARATOR = re.compile(r'(\s+|[、。，．,.!?！？])')
+
+
+######################################
+#  　 　　形態素解析（漢字を含む部分のみ）
+######################################
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+def get_tokenizer():
+    """プロセス全体で共有するjanomeのTokenizerを取得（辞書の読み込みは初回のみ）"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                _tokenizer = Tokenizer()
+    return _tokenizer
+
+def tokenize_reading(text):
+    """形態素解析で読み（カタカナ）に変換"""
+    result = ''
+    for token in get_tokenizer().tokenize(text):
+        # token.reading が読み（カナ）を返す
+        reading = token.reading
+        if reading == '*':  # 読み情報がない場合はそのまま
+            result += token.surface
+        else:
+            result += reading
+    return result
+
+
+######################################
+#  　 　　カタカナ変換
+######################################
+def kana_to_katakana(text):
+    """漢字を含まないテキストを変換表だけでカタカナに揃える
+
+    NFKCで半角カナを全角に（濁点・半濁点は結合）、全角英数字を半角にしてから
+    ひらがなをカタカナに置き換える。
+    """
+    return unicodedata.normalize('NFKC', text).translate(HIRAGANA_TO_KATAKANA)
+
+def has_kanji(text):
+    """漢字を含むか"""
+    return KANJI_PATTERN.search(text) is not None
+
+@functools.lru_cache(maxsize=KATAKANA_CACHE_SIZE)
+def to_katakana(text):
+    """テキストを読み（カタカナ）に変換（同じテキストは再計算しない）
+
+    空白・句読点で区切った部分ごとに、漢字を含む部分だけを形態素解析する。
+    """
+    if not has_kanji(text):
+        return kana_to_katakana(text)
+    parts = []
+    for segment in SEGMENT_SEPARATOR.split(text):
+        if has_kanji(segment):
+            segment = tokenize_reading(segment)
+        parts.append(kana_to_katakana(segment))
+    return ''.join(parts)
+
+def fold_kana(text):
+    """小書き文字・長音の表記ゆれを吸収（照合の両側に同じ処理をかける）"""
+    return text.translate(KANA_FOLDING)
+
+def normalize_kana(text):
+    """照合用にカタカナ化して表記ゆれを吸収"""
+    return fold_kana(to_katakana(text))
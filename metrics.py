@@ -0,0 +1,236 @@
+"""
+録音経路の計測値とデバッグログ
+PortAudioのコールバック内ではprintせず、カウンタを進めるだけにする。
+ログの出力は別スレッドで行い、コールバックの処理時間に影響させない
+"""
+import math
+import threading
+import time
+
+import numpy as np
+
+from .audio_pipeline import BoundedQueue, POLICY_DROP_NEWEST
+
+DEBUG_LOG_QUEUE_SIZE = 256     # 出力待ちのログの上限（溢れたら新しいログを捨てる）
+DEBUG_LOG_INTERVAL = 1.0       # 計測値の要約を出力する間隔（秒）
+
+# レベルメーターの設定
+LEVEL_METER_INTERVAL_MS = 50   # レベルを計算する間隔
+LEVEL_METER_FLOOR_DB = -60.0   # メーターの下限（これ以下は0として表示）
+LEVEL_METER_STEPS = 20         # 表示の段階数（段階が変わったときだけ再描画する）
+
+
+###########################################
+#   　 　　録音コールバックの計測値
+###########################################
+class AudioMetrics:
+    """録音コールバックのカウンタ
+
+    書き込みはコールバック（1スレッド）のみで、他のスレッドは読むだけなのでロックは使わない。
+    読み出し側は更新途中の値を見ることがあるが、表示・ログ用途なので問題にならない。
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """計測値を初期化（録音開始時に呼ぶ）"""
+        self.blocks = 0             # 受け取ったブロック数
+        self.voiced_blocks = 0      # 閾値を超えたブロック数
+        self.input_overflows = 0    # ドライバ側で入力が溢れた回数
+        self.input_underflows = 0   # ドライバ側で入力が足りなかった回数
+        self.last_level = 0.0       # 直近のブロックのピーク
+        self.peak_level = 0.0       # 録音開始からの最大ピーク
+        self.started_at = time.time()
+
+    def record_block(self, indata, threshold):
+        """1ブロック分の音量を記録し、ピークを返す"""
+        level = float(np.max(np.abs(indata)))
+        self.blocks += 1
+        if level > threshold:
+            self.voiced_blocks += 1
+        self.last_level = level
+        if level > self.peak_level:
+            self.peak_level = level
+        return level
+
+    def record_status(self, status):
+        """コールバックに渡されたステータスフラグを記録"""
+        if status.input_overflow:
+            self.input_overflows += 1
+        if status.input_underflow:
+            self.input_underflows += 1
+
+    def snapshot(self):
+        """現在の計測値を辞書で取得"""
+        return {
+            "blocks": self.blocks,
+            "voiced_blocks": self.voiced_blocks,
+            "input_overflows": self.input_overflows,
+            "input_underflows": self.input_underflows,
+            "last_level": self.last_level,
+            "peak_level": self.peak_level,
+            "elapsed": time.time() - self.started_at,
+        }
+
+
+###########################################
+#   　 　　認識結果の処理（メインスレッド）の計測値
+###########################################
+class DispatchMetrics:
+    """タイマー1回ごとの認識結果の処理時間と件数（メインスレッドのみで更新）"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """計測値を初期化（録音開始時に呼ぶ）"""
+        self.ticks = 0              # 認識結果を処理したタイマーの回数
+        self.executed = 0           # 処理した認識結果の数
+        self.deduplicated = 0       # 直前と同じ内容のため処理しなかった数
+        self.deferred_ticks = 0     # 時間の上限に達し、次回に持ち越したタイマーの回数
+        self.last_tick = 0.0        # 直近のタイマー1回分の処理時間（秒）
+        self.max_tick = 0.0         # 最大の処理時間（秒）
+        self.wakeups = 0            # タイマーが呼ばれた回数（処理がなかった回も含む）
+        self.interval = 0.0         # 直近のタイマーの呼び出し間隔（秒）
+        self.last_wait = 0.0        # 直近の認識結果がキューで待った時間（秒）
+
+    def record_tick(self, elapsed, executed, deduplicated, deferred):
+        """タイマー1回分の処理を記録"""
+        self.ticks += 1
+        self.executed += executed
+        self.deduplicated += deduplicated
+        if deferred:
+            self.deferred_ticks += 1
+        self.last_tick = elapsed
+        if elapsed > self.max_tick:
+            self.max_tick = elapsed
+
+    def record_wakeup(self, interval):
+        """タイマーが呼ばれたことと、前回からの間隔を記録"""
+        self.wakeups += 1
+        self.interval = interval
+
+    def record_wait(self, seconds):
+        """認識結果がキューに入ってから取り出されるまでの時間を記録"""
+        self.last_wait = seconds
+
+    def snapshot(self):
+        """現在の計測値を辞書で取得"""
+        return {
+            "ticks": self.ticks,
+            "executed": self.executed,
+            "deduplicated": self.deduplicated,
+            "deferred_ticks": self.deferred_ticks,
+            "last_tick_ms": self.last_tick * 1000,
+            "max_tick_ms": self.max_tick * 1000,
+            "wakeups": self.wakeups,
+            "interval_ms": self.interval * 1000,
+            "last_wait_ms": self.last_wait * 1000,
+        }
+
+
+###########################################
+#   　 　　入力レベルメーター
+###########################################
+class LevelMeter:
+    """間引いて計算したRMS・ピークを、立ち上がりは速く・戻りはゆっくり追従させるメーター
+
+    コールバックではなく区間切り出しスレッドから一定間隔で呼び、
+    直近interval_ms分のサンプルだけをまとめて計算する。
+    """
+
+    def __init__(self, sample_rate=16000, interval_ms=LEVEL_METER_INTERVAL_MS,
+                 attack_ms=10, release_ms=300, floor_db=LEVEL_METER_FLOOR_DB):
+        self.window_samples = int(sample_rate * interval_ms / 1000)
+        self.interval = interval_ms / 1000
+        # 1回の更新で目標値に近づく割合（時定数から計算）
+        self.attack = 1.0 - math.exp(-interval_ms / attack_ms)
+        self.release = 1.0 - math.exp(-interval_ms / release_ms)
+        self.floor_db = floor_db
+        self.reset()
+
+    def reset(self):
+        """表示を下限に戻す"""
+        self.rms_db = self.floor_db
+        self.peak_db = self.floor_db
+        self.last_update = 0.0
+
+    def due(self, now):
+        """前回の計算からinterval_ms以上経過したか"""
+        return now - self.last_update >= self.interval
+
+    def update(self, audio, now):
+        """直近のサンプルからレベルを計算して表示値を更新"""
+        self.last_update = now
+        if len(audio) == 0:
+            return
+        rms = float(np.sqrt(np.mean(np.square(audio))))
+        peak = float(np.max(np.abs(audio)))
+        self.rms_db = self._follow(self.rms_db, self._to_db(rms))
+        self.peak_db = self._follow(self.peak_db, self._to_db(peak))
+
+    def _to_db(self, value):
+        return max(self.floor_db, 20.0 * math.log10(max(value, 1e-9)))
+
+    def _follow(self, current, target):
+        coeff = self.attack if target > current else self.release
+        return current + coeff * (target - current)
+
+    def level(self):
+        """RMSレベル（0.0〜1.0、dBを線形に割り当て）"""
+        return min(1.0, max(0.0, 1.0 - self.rms_db / self.floor_db))
+
+    def peak(self):
+        """ピークレベル（0.0〜1.0）"""
+        return min(1.0, max(0.0, 1.0 - self.peak_db / self.floor_db))
+
+    def step(self):
+        """表示上の段階（この値が変わったときだけ再描画すればよい）"""
+        return int(self.level() * LEVEL_METER_STEPS)
+
+    def indicator(self):
+        """パネル表示用の文字列"""
+        return f"{self.rms_db:.0f} dB（ピーク {self.peak_db:.0f} dB）"
+
+
+###########################################
+#   　 　　デバッグログ出力スレッド
+###########################################
+class AudioDebugLogger(threading.Thread):
+    """録音経路のログを別スレッドで出力（有効にした場合のみ起動する）"""
+
+    def __init__(self, metrics, interval=DEBUG_LOG_INTERVAL):
+        super().__init__(daemon=True)
+        self.metrics = metrics
+        self.interval = interval
+        self.messages = BoundedQueue(DEBUG_LOG_QUEUE_SIZE, POLICY_DROP_NEWEST)
+        self.is_running = False
+
+    def log(self, message):
+        """ログを出力待ちに追加（待たずに戻るのでコールバックからも呼べる）"""
+        self.messages.offer(message)
+
+    def run(self):
+        """ログと計測値の要約を一定間隔で出力"""
+        self.is_running = True
+        last_blocks = 0
+        while self.is_running:
+            time.sleep(self.interval)
+            while not self.messages.empty():
+                print(f"[音声] {self.messages.get_nowait()}")
+
+            stats = self.metrics.snapshot()
+            if stats["blocks"] != last_blocks:
+                print(
+                    f"[音声] ブロック:{stats['blocks']} 音声:{stats['voiced_blocks']} "
+                    f"溢れ:{stats['input_overflows']} 不足:{stats['input_underflows']} "
+                    f"ピーク:{stats['peak_level']:.2f}"
+                )
+                last_blocks = stats["blocks"]
+        if self.messages.dropped_count:
+            print(f"[音声] 出力できなかったログ: {self.messages.dropped_count}件")
+
+    def stop(self):
+        """スレッドの停止"""
+        self.is_running = False
@@ -0,0 +1,467 @@
+"""
+音声認識モデルの管理
+モデルはインポート時ではなく、初回の認識要求時（または登録直後）に
+バックグラウンドスレッドで読み込む
+"""
+import difflib
+import gc
+import importlib.util
+import json
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+
+# モデルの状態
+MODEL_STATE_UNLOADED = "UNLOADED"
+MODEL_STATE_LOADING = "LOADING"
+MODEL_STATE_READY = "READY"
+MODEL_STATE_FAILED = "FAILED"
+
+# パネル表示用の状態名
+MODEL_STATE_LABELS = {
+    MODEL_STATE_UNLOADED: "未読み込み",
+    MODEL_STATE_LOADING: "読み込み中",
+    MODEL_STATE_READY: "準備完了",
+    MODEL_STATE_FAILED: "読み込み失敗",
+}
+
+# faster-whisperで選択可能な計算精度（AUTOは自動計測結果を使用）
+COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+DEFAULT_COMPUTE_TYPE = "int8"
+DEFAULT_CPU_THREADS = 4
+DEFAULT_MODEL_SIZE = "small"
+
+# 自動計測の設定
+CALIBRATION_THREAD_COUNTS = (2, 4, 8)
+DEFAULT_ACCURACY_FLOOR = 0.9  # float32（または正解テキスト）との一致率の下限
+SAMPLE_RATE = 16000
+
+ADDON_DIR = os.path.dirname(__file__)
+MODEL_PROFILE_PATH = os.path.join(ADDON_DIR, "model_profile.json")
+CALIBRATION_DIR = os.path.join(ADDON_DIR, "calibration")
+REFERENCE_CLIP_PATH = os.path.join(CALIBRATION_DIR, "reference.wav")
+REFERENCE_TEXT_PATH = os.path.join(CALIBRATION_DIR, "reference.txt")
+
+
+def detect_backend():
+    """利用可能な音声認識ライブラリを判定（インポートはしない）"""
+    if importlib.util.find_spec("faster_whisper") is not None:
+        return "faster-whisper"
+    if importlib.util.find_spec("whisper") is not None:
+        return "whisper"
+    return None
+
+
+######################################
+#  　 　　自動計測結果の読み書き
+######################################
+def load_model_profile():
+    """自動計測で保存した推論設定を読み込む（なければNone）"""
+    try:
+        with open(MODEL_PROFILE_PATH, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"推論設定ファイルの読み込みエラー: {e}")
+        return None
+
+def save_model_profile(profile):
+    """自動計測の結果を保存"""
+    try:
+        with open(MODEL_PROFILE_PATH, 'w', encoding='utf-8') as file:
+            json.dump(profile, file, ensure_ascii=False, indent=2)
+        return True
+    except OSError as e:
+        print(f"推論設定ファイルの保存エラー: {e}")
+        return False
+
+def resolve_model_config(compute_type, cpu_threads):
+    """UIの設定値から実際に使う推論設定を決定（AUTOは計測結果→int8の順）"""
+    if compute_type == "AUTO":
+        profile = load_model_profile()
+        if profile and profile.get("compute_type") in COMPUTE_TYPES:
+            return {
+                "model_size": profile.get("model_size", DEFAULT_MODEL_SIZE),
+                "compute_type": profile["compute_type"],
+                "cpu_threads": int(profile.get("cpu_threads", cpu_threads)),
+            }
+        compute_type = DEFAULT_COMPUTE_TYPE
+    return {
+        "model_size": DEFAULT_MODEL_SIZE,
+        "compute_type": compute_type,
+        "cpu_threads": int(cpu_threads),
+    }
+
+
+######################################
+#  　 　　リファレンス音声の読み書き
+######################################
+def read_wav_clip(path):
+    """16kHzモノラル16bitのWAVをfloat32配列として読み込む"""
+    with wave.open(path, 'rb') as wav:
+        if wav.getframerate() != SAMPLE_RATE or wav.getsampwidth() != 2:
+            raise ValueError("リファレンス音声は16kHz/16bitのWAVである必要があります")
+        frames = wav.readframes(wav.getnframes())
+        channels = wav.getnchannels()
+    audio = np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return audio
+
+def write_wav_clip(path, audio):
+    """float32配列を16kHzモノラル16bitのWAVとして保存"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm.tobytes())
+
+def read_reference_text():
+    """リファレンス音声の正解テキスト（なければNone）"""
+    try:
+        with open(REFERENCE_TEXT_PATH, 'r', encoding='utf-8') as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+######################################
+#  　 　　メモリ使用量の計測
+######################################
+def get_current_rss():
+    """現在の常駐メモリ量（バイト）を取得（取得できなければNone）"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", 'r') as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+class RssSampler(threading.Thread):
+    """計測中のピークメモリを一定間隔でサンプリング"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.baseline = get_current_rss()
+        self.peak = self.baseline
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            rss = get_current_rss()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self):
+        """停止してベースラインからのピーク増加量（バイト）を返す"""
+        self._stop_event.set()
+        self.join(timeout=1.0)
+        if self.baseline is None or self.peak is None:
+            return None
+        return self.peak - self.baseline
+
+def text_similarity(text, reference):
+    """認識結果の一致率（空白・句読点を除いた文字列の類似度）"""
+    def normalize(value):
+        return "".join(ch for ch in value.lower() if ch.isalnum())
+    return difflib.SequenceMatcher(None, normalize(text), normalize(reference)).ratio()
+
+
+###########################################
+#   　 　　音声認識モデルの遅延読み込み
+###########################################
+class ModelRegistry:
+    """音声認識モデルの遅延読み込み管理（シングルトン）"""
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, 'initialized'):
+            return
+        self.initialized = True
+
+        self.backend = detect_backend()
+        self.model = None
+        self.error = None
+        self.load_time = None    # 読み込みに掛かった時間（秒）
+        self.config = resolve_model_config("AUTO", DEFAULT_CPU_THREADS)
+        self.loaded_config = None
+        self.requested_setting = ("AUTO", DEFAULT_CPU_THREADS)  # UIで選択された値
+        self.state = MODEL_STATE_UNLOADED
+        if self.backend is None:
+            self.state = MODEL_STATE_FAILED
+            self.error = "音声認識ライブラリが見つかりません"
+
+        self._state_lock = threading.Lock()
+        self._ready_event = threading.Event()  # 読み込み完了（成功・失敗とも）で立つ
+        self._load_thread = None
+
+        # 自動計測の状態
+        self.calibration_running = False
+        self.calibration_status = ""
+        self.calibration_language = None
+        self._calibration_thread = None
+
+    def configure(self, compute_type, cpu_threads):
+        """計算精度とスレッド数を設定（読み込み済みで設定が変わった場合は再読み込み）"""
+        with self._state_lock:
+            self.requested_setting = (compute_type, cpu_threads)
+            config = resolve_model_config(compute_type, cpu_threads)
+            if config == self.config:
+                return
+            self.config = config
+            reload_needed = self.state == MODEL_STATE_READY
+            if reload_needed:
+                # 古いモデルを解放してから読み込み直す
+                self.model = None
+                self.state = MODEL_STATE_UNLOADED
+        print(f"推論設定を変更: {config['compute_type']} / {config['cpu_threads']}スレッド")
+        if reload_needed:
+            gc.collect()
+            self.request_load()
+
+    def request_load(self):
+        """モデルの読み込みを要求（読み込み中・読み込み済みなら何もしない）"""
+        with self._state_lock:
+            if self.state in (MODEL_STATE_LOADING, MODEL_STATE_READY):
+                return self.state
+            if self.backend is None:
+                return self.state
+
+            self.state = MODEL_STATE_LOADING
+            self.error = None
+            self._ready_event.clear()
+            self._load_thread = threading.Thread(
+                target=self._load_worker,
+                name="BVCModelLoader",
+                daemon=True
+            )
+            self._load_thread.start()
+            return self.state
+
+    def _load_worker(self):
+        """バックグラウンドでのモデル読み込み"""
+        config = dict(self.config)
+        print(f"音声認識モデルの読み込みを開始します ({self.backend}, {config['compute_type']})")
+        start = time.time()
+        try:
+            model = self._create_model(config)
+        except Exception as e:
+            with self._state_lock:
+                self.model = None
+                self.state = MODEL_STATE_FAILED
+                self.error = str(e)
+            print(f"音声認識モデルの読み込みに失敗: {e}")
+        else:
+            with self._state_lock:
+                # 読み込み中に設定が変わった場合は読み込み直す
+                if config != self.config:
+                    self.state = MODEL_STATE_UNLOADED
+                else:
+                    self.model = model
+                    self.loaded_config = config
+                    self.state = MODEL_STATE_READY
+                    self.load_time = time.time() - start
+            if self.state == MODEL_STATE_UNLOADED:
+                del model
+                self.request_load()
+                return
+            print(f"音声認識モデルの読み込み完了 ({self.load_time:.1f}秒)")
+        finally:
+            if self.state != MODEL_STATE_LOADING:
+                self._ready_event.set()
+
+    def _create_model(self, config):
+        """バックエンドに応じたモデルを生成"""
+        if self.backend == "faster-whisper":
+            from faster_whisper import WhisperModel
+            # int8系は重みを量子化するため、float32に比べて推論時間・メモリとも削減される
+            return WhisperModel(
+                config["model_size"],
+                device="cpu",
+                compute_type=config["compute_type"],
+                cpu_threads=config["cpu_threads"],  # CPUスレッド数
+                num_workers=1         # 同時に推論する数（1件ずつ処理するため1で十分）
+            )
+
+        import whisper
+        return whisper.load_model("base")  # 従来のWhisperモデル読み込み
+
+    def wait_until_ready(self, timeout=None):
+        """読み込み完了を待機し、利用可能ならTrueを返す"""
+        if self.state == MODEL_STATE_UNLOADED:
+            return False
+        self._ready_event.wait(timeout)
+        return self.state == MODEL_STATE_READY
+
+    def is_ready(self):
+        return self.state == MODEL_STATE_READY
+
+    def get_model(self):
+        """読み込み済みのモデルを取得（未完了ならNone）"""
+        if self.state != MODEL_STATE_READY:
+            return None
+        return self.model
+
+    def get_status(self):
+        """パネル表示用の状態情報を取得"""
+        return {
+            "state": self.state,
+            "label": MODEL_STATE_LABELS.get(self.state, self.state),
+            "backend": self.backend,
+            "error": self.error,
+            "load_time": self.load_time,
+            "compute_type": self.config["compute_type"],
+            "cpu_threads": self.config["cpu_threads"],
+            "calibration_running": self.calibration_running,
+            "calibration_status": self.calibration_status,
+        }
+
+    ######################################
+    #  　 　　推論設定の自動計測
+    ######################################
+    def start_calibration(self, audio, reference_text=None, accuracy_floor=DEFAULT_ACCURACY_FLOOR, language=None,
+                          save_clip_path=None):
+        """リファレンス音声で各計算精度・スレッド数を計測（バックグラウンド）
+
+        save_clip_pathを指定した場合、録音した音声から文字が認識できたときだけそのパスに保存する。
+        """
+        if self.calibration_running:
+            return False
+        if self.backend != "faster-whisper":
+            self.calibration_status = "自動計測はfaster-whisperでのみ利用できます"
+            return False
+
+        self.calibration_running = True
+        self.calibration_language = language
+        self.calibration_status = "計測準備中"
+        self._calibration_thread = threading.Thread(
+            target=self._calibration_worker,
+            args=(audio, reference_text, accuracy_floor, save_clip_path),
+            name="BVCModelCalibration",
+            daemon=True
+        )
+        self._calibration_thread.start()
+        return True
+
+    def _calibration_worker(self, audio, reference_text, accuracy_floor, save_clip_path):
+        try:
+            profile = self._run_calibration(audio, reference_text, accuracy_floor, save_clip_path)
+            if profile is None:
+                self.calibration_status = "精度の下限を満たす設定がありませんでした"
+                return
+            save_model_profile(profile)
+            self.calibration_status = (
+                f"最速設定: {profile['compute_type']} / {profile['cpu_threads']}スレッド "
+                f"(RTF {profile['rtf']:.2f})"
+            )
+            print(f"推論設定の自動計測完了: {self.calibration_status}")
+            # AUTO選択時は計測結果をすぐに反映
+            compute_type, cpu_threads = self.requested_setting
+            if compute_type == "AUTO":
+                self.configure(compute_type, cpu_threads)
+        except Exception as e:
+            self.calibration_status = f"計測エラー: {e}"
+            print(f"推論設定の自動計測エラー: {e}")
+        finally:
+            self.calibration_running = False
+
+    def _run_calibration(self, audio, reference_text, accuracy_floor, save_clip_path=None):
+        """各設定で認識してRTF・ピークメモリ・一致率を計測し、最速の設定を返す"""
+        from faster_whisper import WhisperModel
+
+        duration = len(audio) / SAMPLE_RATE
+        max_threads = os.cpu_count() or DEFAULT_CPU_THREADS
+        thread_counts = sorted({min(n, max_threads) for n in CALIBRATION_THREAD_COUNTS})
+        # 正解テキストがなければfloat32の結果を基準にするため、float32を最初に計測
+        compute_types = ("float32",) + tuple(ct for ct in COMPUTE_TYPES if ct != "float32")
+        language = self.calibration_language
+
+        results = []
+        for compute_type in compute_types:
+            for cpu_threads in thread_counts:
+                self.calibration_status = f"計測中: {compute_type} / {cpu_threads}スレッド"
+                sampler = RssSampler()
+                sampler.start()
+                try:
+                    model = WhisperModel(
+                        self.config["model_size"],
+                        device="cpu",
+                        compute_type=compute_type,
+                        cpu_threads=cpu_threads,
+                        num_workers=1
+                    )
+                    # 初回呼び出しの初期化コストを除くため、先頭1秒で暖機してから計測
+                    list(model.transcribe(audio[:SAMPLE_RATE], language=language, beam_size=1)[0])
+                    start = time.perf_counter()
+                    segments, _ = model.transcribe(audio, language=language, beam_size=5, temperature=0.0)
+                    text = "".join(segment.text for segment in segments).strip()
+                    elapsed = time.perf_counter() - start
+                except Exception as e:
+                    print(f"計測失敗 ({compute_type} / {cpu_threads}スレッド): {e}")
+                    sampler.stop()
+                    continue
+                peak_rss = sampler.stop()
+                del model
+                gc.collect()
+
+                if reference_text is None:
+                    # 無音などで文字が認識できない音声を基準にすると、すべての設定の一致率が0になる
+                    if not text:
+                        raise ValueError(
+                            "リファレンス音声から文字が認識できませんでした"
+                            "（録音し直すか、reference.txtに読み上げた内容を書いてください）"
+                        )
+                    reference_text = text
+                if save_clip_path and text:
+                    # 文字が認識できた録音だけを次回以降のリファレンスとして残す
+                    write_wav_clip(save_clip_path, audio)
+                    save_clip_path = None
+                results.append({
+                    "compute_type": compute_type,
+                    "cpu_threads": cpu_threads,
+                    "rtf": elapsed / duration if duration > 0 else 0.0,
+                    "peak_rss_mb": peak_rss / (1024 * 1024) if peak_rss is not None else None,
+                    "accuracy": text_similarity(text, reference_text) if reference_text else 0.0,
+                    "text": text,
+                })
+                print(f"  {compute_type} / {cpu_threads}スレッド: RTF {results[-1]['rtf']:.2f}, "
+                      f"一致率 {results[-1]['accuracy']:.2f}")
+
+        passing = [r for r in results if r["accuracy"] >= accuracy_floor]
+        if not passing:
+            return None
+        best = min(passing, key=lambda r: r["rtf"])
+        return {
+            "model_size": self.config["model_size"],
+            "compute_type": best["compute_type"],
+            "cpu_threads": best["cpu_threads"],
+            "rtf": best["rtf"],
+            "peak_rss_mb": best["peak_rss_mb"],
+            "accuracy": best["accuracy"],
+            "accuracy_floor": accuracy_floor,
+            "timestamp": time.time(),
+            "results": results,
+        }
+
+
+# グローバルインスタンス
+model_registry = ModelRegistry()
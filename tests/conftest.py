@@ -0,0 +1,32 @@
+"""
+テスト用の読み込み設定
+アドオンの__init__.py（bpyが必要）を実行せずに、bpyに依存しないモジュールだけを
+パッケージ内の相対importが使える形で読み込む
+"""
+import os
+import sys
+import types
+
+import pytest
+
+ADDON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "bvc_addon"
+
+if PACKAGE_NAME not in sys.modules:
+    package = types.ModuleType(PACKAGE_NAME)
+    package.__path__ = [ADDON_DIR]
+    sys.modules[PACKAGE_NAME] = package
+
+
+class _AddonRootAsDirectory:
+    """アドオンのルートを（__init__.pyを読み込むPackageではなく）通常のディレクトリとして集める"""
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_collect_directory(self, path, parent):
+        if str(path) == ADDON_DIR:
+            return pytest.Dir.from_parent(parent, path=path)
+        return None
+
+
+def pytest_configure(config):
+    config.pluginmanager.register(_AddonRootAsDirectory(), "bvc_addon_root")
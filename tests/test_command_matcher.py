@@ -0,0 +1,228 @@
+"""
+音声コマンドの照合（完全一致・あいまい照合）の確認
+"""
+import pytest
+
+pytest.importorskip("janome")
+
+from bvc_addon.command_index import (  # noqa: E402
+    build_command_records,
+    normalize_command_text,
+    uses_word_boundaries,
+)
+from bvc_addon.command_matcher import (  # noqa: E402
+    CommandMatcher,
+    myers_positions,
+    myers_search_distance,
+    pattern_masks,
+)
+
+COMMANDS = {
+    "日本語": {
+        "保存": {"description": "データの保存処理", "code": ""},
+        "削除": {"description": "オブジェクトの削除", "code": ""},
+        "立方体を追加": {"description": "立方体を追加する", "code": ""},
+    },
+    "English": {
+        "save": {"description": "save data", "code": ""},
+        "delete": {"description": "delete object", "code": ""},
+        "update": {"description": "update data", "code": ""},
+        "add cube": {"description": "add a cube", "code": ""},
+        "select all": {"description": "select all objects", "code": ""},
+    },
+}
+MIN_CONFIDENCE = 0.8
+
+
+@pytest.fixture(scope="module")
+def matchers():
+    return {
+        name: CommandMatcher(records, word_boundaries=uses_word_boundaries(name))
+        for name, records in build_command_records(COMMANDS).items()
+    }
+
+
+def fuzzy_key(matchers, language, text):
+    found = matchers[language].fuzzy_match(normalize_command_text(text, language), MIN_CONFIDENCE)
+    return found[0].key if found else None
+
+
+def test_word_boundaries_by_language():
+    assert uses_word_boundaries("English")
+    assert not uses_word_boundaries("日本語")
+    assert not uses_word_boundaries("中文")
+
+
+def test_myers_positions():
+    masks = pattern_masks("update")
+    # 開始位置が自由な場合は、どこで終わる一致でも見つかる
+    assert (9, 0) in myers_positions(masks, 6, "my update", 0)
+    assert myers_search_distance(masks, 6, "my update") == 0
+    # 先頭から一致させる場合は、先頭の「my 」の分だけ距離が増える
+    assert myers_positions(masks, 6, "my update", 2, anchored=True) == []
+    assert myers_positions(masks, 6, "updat", 1, anchored=True)[-1] == (5, 1)
+
+
+def test_exact_match_still_found(matchers):
+    text = normalize_command_text("Please save", "English")
+    assert matchers["English"].best_match(text).key == "save"
+
+
+@pytest.mark.parametrize("text", ["i have an idea", "same thing", "nice wave", "safe"])
+def test_short_key_is_not_fuzzy_matched(matchers, text):
+    assert fuzzy_key(matchers, "English", text) is None
+
+
+@pytest.mark.parametrize("text", ["updates", "please updat", "ad cube", "select al now"])
+def test_misrecognized_word_is_fuzzy_matched(matchers, text):
+    assert fuzzy_key(matchers, "English", text) is not None
+
+
+@pytest.mark.parametrize("text", ["mandate", "outdated", "addcubed"])
+def test_key_is_not_matched_inside_other_words(matchers, text):
+    assert fuzzy_key(matchers, "English", text) is None
+
+
+def test_confidence_floor(matchers):
+    text = normalize_command_text("selec al", "English")
+    assert matchers["English"].fuzzy_match(text, 0.0)[0].key == "select all"
+    assert matchers["English"].fuzzy_match(text, 0.85) is None
+
+
+def test_japanese_fuzzy_match_within_text(matchers):
+    # 日本語は空白で区切らないため、テキストの途中でも照合する
+    assert fuzzy_key(matchers, "日本語", "りっぽうたいおついかして") == "立方体を追加"
+
+
+@pytest.fixture(scope="module")
+def bundled_english():
+    import json
+    from bvc_addon.command_index import COMMAND_JSON_PATH
+    with open(COMMAND_JSON_PATH, 'r', encoding='utf-8') as file:
+        records = build_command_records(json.load(file))["English"]
+    return CommandMatcher(records, word_boundaries=True)
+
+
+@pytest.fixture(scope="module")
+def bundled_japanese():
+    import json
+    from bvc_addon.command_index import COMMAND_JSON_PATH
+    with open(COMMAND_JSON_PATH, 'r', encoding='utf-8') as file:
+        records = build_command_records(json.load(file))["日本語"]
+    return CommandMatcher(records)
+
+
+def test_description_match_finds_paraphrase(bundled_japanese):
+    # キー（サクジヨ）と共通部分がなくても、説明文（オブジェクトの削除）から見つける
+    text = normalize_command_text("オブジェクトを消して", "日本語")
+    assert bundled_japanese.best_match(text) is None
+    found = bundled_japanese.description_match(text, 0.3)
+    assert found is not None and found[0].key == "削除"
+
+
+@pytest.mark.parametrize("text, key", [("delete this object", "delete"), ("update data please", "update")])
+def test_description_match(bundled_english, text, key):
+    found = bundled_english.description_match(normalize_command_text(text, "English"), 0.3)
+    assert found is not None and found[0].key == key
+
+
+def test_description_match_requires_margin(bundled_english):
+    # 2つのコマンドの説明文に同程度似ている場合は採用しない
+    text = normalize_command_text("update or save the data", "English")
+    assert bundled_english.description_match(text, 0.3) is None
+
+
+def test_overlap_prefers_longest_key():
+    records = build_command_records({"English": {
+        "add": {"description": "", "code": ""},
+        "add cube": {"description": "", "code": ""},
+    }})["English"]
+    assert CommandMatcher(records).best_match("please add cube").key == "add cube"
+
+
+def test_overlap_prefers_priority_then_file_order():
+    # 「ab」と「bc」はどちらも2文字で重なる
+    def matcher(commands):
+        return CommandMatcher(build_command_records({"English": commands})["English"])
+
+    plain = {"description": "", "code": ""}
+    assert matcher({"ab": plain, "bc": plain}).best_match("abc").key == "ab"
+    assert matcher({"bc": plain, "ab": plain}).best_match("abc").key == "bc"
+    preferred = {"description": "", "code": "", "priority": 1}
+    assert matcher({"ab": plain, "bc": preferred}).best_match("abc").key == "bc"
+    # 重ならない位置の一致は両方とも残る
+    found = matcher({"ab": plain, "bc": preferred}).match_all("abc ab")
+    assert [(record.key, start) for record, start, _ in found] == [("bc", 1), ("ab", 4)]
+
+
+def test_match_all_positions():
+    records = build_command_records({"English": {
+        "save": {"description": "", "code": ""},
+        "delete": {"description": "", "code": ""},
+        "delete all": {"description": "", "code": ""},
+    }})["English"]
+    found = CommandMatcher(records).match_all("save then delete all and save")
+    assert [(record.key, start, end) for record, start, end in found] == [
+        ("save", 0, 4), ("delete all", 10, 20), ("save", 25, 29),
+    ]
+
+
+def test_priority_is_read_from_json():
+    records = build_command_records({"English": {
+        "save": {"description": "", "code": "", "priority": 3},
+        "delete": {"description": "", "code": ""},
+        "update": "update data",
+    }})["English"]
+    assert [record.priority for record in records] == [3, 0, 0]
+
+
+@pytest.mark.benchmark
+def test_exact_match_with_many_commands_is_sub_millisecond():
+    import time
+    commands = {f"command {number:05d}": {"description": "", "code": ""} for number in range(10000)}
+    matcher = CommandMatcher(build_command_records({"English": commands})["English"])
+    text = "please run command 04321 and then command 09999 right now"
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        record = matcher.best_match(text)
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"\n10,000コマンドの完全一致: {elapsed * 1000:.3f} ms")
+    assert record.key == "command 04321"
+    assert elapsed < 0.001
+
+
+def test_set_fuzzy_ratio_keeps_exact_and_description_tables(matchers):
+    matcher = matchers["English"]
+    automaton, description, fuzzy = matcher.automaton, matcher.description, matcher.fuzzy
+    matcher.set_fuzzy_ratio(0.4)
+    try:
+        assert matcher.automaton is automaton
+        assert matcher.description is description
+        assert matcher.fuzzy is not fuzzy and matcher.fuzzy.max_ratio == 0.4
+    finally:
+        matcher.set_fuzzy_ratio(fuzzy.max_ratio)
+
+
+@pytest.mark.benchmark
+def test_fuzzy_match_with_thousands_of_commands():
+    import random
+    import time
+    generator = random.Random(1)
+
+    def word():
+        return "".join(generator.choice("abcdefghiklmnoprstu") for _ in range(generator.randint(3, 8)))
+
+    commands = {}
+    while len(commands) < 5000:
+        commands[" ".join(word() for _ in range(generator.randint(1, 3)))] = {"description": "", "code": ""}
+    matcher = CommandMatcher(build_command_records({"English": commands})["English"], word_boundaries=True)
+    text = ("please could you select the camera and then rotate the cube to the left "
+            "and smooth all the objects in front view")
+    rounds = 50
+    start = time.perf_counter()
+    for _ in range(rounds):
+        matcher.fuzzy_match(text, MIN_CONFIDENCE)
+    elapsed = (time.perf_counter() - start) / rounds
+    print(f"\n5,000コマンドのあいまい照合: {elapsed * 1000:.2f} ms")
+    assert elapsed < 0.005
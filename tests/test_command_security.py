@@ -0,0 +1,77 @@
+"""
+音声コマンドのコードの安全性チェックの確認
+"""
+import pytest
+
+pytest.importorskip("janome")
+
+from bvc_addon.command_security import (  # noqa: E402
+    DEFAULT_ALLOWED_IMPORTS,
+    POLICY_STANDARD,
+    POLICY_TRUSTED,
+    check_command_code,
+    get_command_policy,
+)
+
+STANDARD = get_command_policy(POLICY_STANDARD, DEFAULT_ALLOWED_IMPORTS)
+
+
+@pytest.mark.parametrize("code", [
+    "bpy.ops.object.delete()",
+    "import math\nbpy.context.object.rotation_euler.z += math.pi / 2",
+    "from mathutils import Vector\nv = Vector((0, 0, 1))",
+    "name = getattr(bpy.context.object, 'name')",
+    "x = random.random()",
+    "import numpy as np\nx = np.zeros(3)",
+])
+def test_allowed_code(code):
+    compiled, error = check_command_code(code, STANDARD)
+    assert error is None
+    assert compiled is not None
+
+
+@pytest.mark.parametrize("code", [
+    "import os",
+    "from subprocess import run",
+    "random._os.system('echo x')",
+    "getattr(random, '_os').system('echo x')",
+    "getattr(random, name)",
+    "from random import _os",
+    "import random._os",
+    "bpy.__class__",
+    "open('/tmp/x', 'w')",
+    "__import__('os')",
+    "exec('1')",
+    # 禁止した関数を別名にして呼ぶ
+    "o = open\no('/tmp/x', 'w').write('pwn')",
+    "e = exec\ne('import os')",
+    "g = getattr\ng(random, '_os').system('id')",
+    "v = vars\nv(random)['_os'].system('id')",
+    "f = [getattr][0]",
+    # 属性名を*やキーワード引数で渡す
+    "getattr(*[random, '_o' + 's'])",
+    "getattr(random, *['_os'])",
+    "getattr(random)",
+    "setattr(bpy.context, name='x', value=1)",
+    # bpyからコードを実行する入口
+    "t = bpy.data.texts.new('x')\nt.write('import os')\nt.as_module()",
+    "getattr(bpy.data.texts['x'], 'as_module')()",
+    "bpy.utils.execfile('/tmp/x.py')",
+    "bpy.ops.script.python_file_run(filepath='/tmp/x.py')",
+])
+def test_rejected_code(code):
+    compiled, error = check_command_code(code, STANDARD)
+    assert compiled is None
+    assert error
+
+
+def test_allowlist_covers_runtime_namespace():
+    # 名前空間で使えるモジュールはimportしても拒否されない
+    allowed = {name.strip() for name in DEFAULT_ALLOWED_IMPORTS.split(",")}
+    assert {"bpy", "bmesh", "mathutils", "math", "random", "numpy"} <= allowed
+
+
+def test_trusted_policy_only_checks_syntax():
+    trusted = get_command_policy(POLICY_TRUSTED, DEFAULT_ALLOWED_IMPORTS)
+    assert check_command_code("random._os", trusted)[1] is None
+    assert check_command_code("random._os(", trusted)[0] is None
@@ -0,0 +1,77 @@
+"""
+カナ変換の確認と、形態素解析だけで変換していた従来の方法との速度比較
+janomeが入っていない環境では飛ばす
+"""
+import time
+
+import pytest
+
+pytest.importorskip("janome")
+
+from bvc_addon.kana import (  # noqa: E402
+    get_tokenizer,
+    kana_to_katakana,
+    to_katakana,
+    tokenize_reading,
+)
+
+# 音声認識の書き起こしに近い文（かな・英語が中心で、漢字を含むものが一部）
+TRANSCRIPTS = [
+    "ほぞん",
+    "ほぞんして",
+    "さくじょ",
+    "それをさくじょ",
+    "こうしん",
+    "キューブをついか",
+    "ぜんぶせんたく",
+    "オブジェクトをほぞん",
+    "ｶﾒﾗをせんたく",
+    "save",
+    "delete the cube",
+    "Ｓａｖｅ ｆｉｌｅ",
+    "保存",
+    "削除して",
+    "立方体を追加",
+    "カメラを選択して、削除",
+]
+BENCHMARK_ROUNDS = 50
+MIN_SPEEDUP = 1.5  # 負荷による揺れを見込んだ最低限の速度差（手元では約4倍）
+
+
+def tokenizer_baseline(text):
+    """従来の変換（全文を形態素解析してからカタカナに揃える）"""
+    return kana_to_katakana(tokenize_reading(text))
+
+
+def measure(convert, texts, rounds=BENCHMARK_ROUNDS):
+    """texts全体をrounds回変換したときの1文あたりの時間（秒）"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            convert(text)
+    return (time.perf_counter() - start) / (rounds * len(texts))
+
+
+@pytest.mark.parametrize("text", TRANSCRIPTS)
+def test_reading_matches_tokenizer_baseline(text):
+    assert to_katakana.__wrapped__(text) == tokenizer_baseline(text)
+
+
+def test_kana_only_transcripts_skip_tokenizer(monkeypatch):
+    def fail(text):
+        raise AssertionError(f"'{text}' が形態素解析に渡されました")
+
+    monkeypatch.setattr("bvc_addon.kana.tokenize_reading", fail)
+    assert to_katakana.__wrapped__("それをさくじょ") == "ソレヲサクジョ"
+    assert to_katakana.__wrapped__("delete the cube") == "delete the cube"
+
+
+@pytest.mark.benchmark
+def test_benchmark_against_tokenizer_baseline():
+    get_tokenizer()  # 辞書の読み込みは計測に含めない
+    # キャッシュの効果を除くため、どちらもキャッシュなしの変換で比べる
+    fast = measure(to_katakana.__wrapped__, TRANSCRIPTS)
+    baseline = measure(tokenizer_baseline, TRANSCRIPTS)
+    print(f"\n変換表＋漢字部分のみ解析: {fast * 1e6:.1f} us/文, "
+          f"全文を形態素解析: {baseline * 1e6:.1f} us/文 ({baseline / fast:.1f}倍)")
+    assert baseline / fast >= MIN_SPEEDUP
@@ -0,0 +1,94 @@
+"""
+推論が実時間に追いつかないときもメモリ使用量が増え続けないことの確認
+"""
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from bvc_addon.audio_buffer import AudioRingBuffer
+from bvc_addon.audio_pipeline import (
+    BoundedQueue,
+    POLICY_COALESCE,
+    POLICY_DROP_NEWEST,
+    POLICY_DROP_OLDEST,
+    merge_audio_windows,
+)
+from bvc_addon.model_registry import get_current_rss
+
+WINDOW_SAMPLES = 16000 * 2        # 2秒の区間（約128KB）
+PRODUCED_WINDOWS = 1500           # 上限がなければ約190MB溜まる量
+ALLOWED_GROWTH = 32 * 1024 * 1024  # 計測誤差として許す増加量
+
+
+def current_rss():
+    """現在の常駐メモリ量（バイト）。取得できない環境では飛ばす"""
+    rss = get_current_rss()
+    if rss is None:
+        pytest.skip("常駐メモリ量を取得できない環境です")
+    return rss
+
+
+def make_window(index):
+    # np.onesでページを実際に確保させる（zerosは触れるまで常駐しないことがある）
+    return {"audio": np.ones(WINDOW_SAMPLES, dtype=np.float32), "captured_at": index, "noise_floor": None}
+
+
+@pytest.mark.parametrize("policy", [POLICY_DROP_OLDEST, POLICY_DROP_NEWEST, POLICY_COALESCE])
+def test_window_queue_rss_stays_flat_with_slow_inference(policy):
+    window_queue = BoundedQueue(2, policy, coalesce=merge_audio_windows)
+    stop = threading.Event()
+    consumed = []
+
+    def slow_inference():
+        # 1区間ごとに待たせて、推論が実時間に追いつかない状態を作る
+        while not stop.is_set():
+            try:
+                window = window_queue.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            consumed.append(len(window["audio"]))
+            time.sleep(0.02)
+
+    worker = threading.Thread(target=slow_inference, daemon=True)
+    worker.start()
+    try:
+        for index in range(100):
+            window_queue.offer(make_window(index))
+        baseline = current_rss()
+        for index in range(100, PRODUCED_WINDOWS):
+            window_queue.offer(make_window(index))
+        grown = current_rss() - baseline
+    finally:
+        stop.set()
+        worker.join(timeout=2.0)
+
+    assert grown < ALLOWED_GROWTH, f"RSSが{grown / 1024 / 1024:.1f}MB増加しました"
+    assert window_queue.qsize() <= 2
+    assert window_queue.dropped_count + window_queue.coalesced_count > 0  # 実際に溢れていた
+
+
+def test_coalesced_window_is_capped():
+    merged = make_window(0)
+    for index in range(1, 40):
+        merged = merge_audio_windows(merged, make_window(index))
+    assert len(merged["audio"]) == 16000 * 30
+    assert merged["captured_at"] == 0
+
+
+def test_ring_buffer_rss_stays_flat_without_reader():
+    ring = AudioRingBuffer(10.0)
+    block = np.ones((1024, 1), dtype=np.float32)
+    for _ in range(200):
+        ring.write(block)
+    baseline = current_rss()
+    # 読み出し側が止まったまま10分相当を書き込む
+    for _ in range(16000 * 600 // 1024):
+        ring.write(block)
+    grown = current_rss() - baseline
+
+    assert ring.available() == ring.capacity
+    assert ring.overrun_count == 1
+    assert grown < ALLOWED_GROWTH, f"RSSが{grown / 1024 / 1024:.1f}MB増加しました"
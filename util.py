@@ -6,7 +6,6 @@ import os
 import numpy as np
 import queue
 import threading
-from janome.tokenizer import Tokenizer
 
 from .language_config import (
     DISPLAY_TO_CODE,
@@ -17,30 +16,36 @@ from .language_config import (
     LANGUAGE_KEYS
 )
 
-# 音声認識ライブラリのインポート（faster-whisper優先）
-try:
-    from faster_whisper import WhisperModel
-    # CPU環境での最適化設定
-    model = WhisperModel(
-        "small",
-        device="cpu",
-        compute_type="float32",  # メモリ使用量を削減
-        cpu_threads=4,        # CPUスレッド数を制限
-        num_workers=1         # ワーカー数を制限してメモリ節約
-    )
+from .audio_buffer import AudioRingBuffer
+from .audio_pipeline import (
+    BoundedQueue,
+    SpeechSegmenter,
+    POLICY_DROP_OLDEST,
+    POLICY_DROP_NEWEST,
+    SEGMENT_MODE_FIXED,
+    merge_audio_windows,
+)
+from .vad import FrameVAD, trim_silence
+from .device_profiles import (
+    device_profile_key,
+    get_device_profile,
+)
+from .config_snapshot import get_config, publish_config
+from .metrics import AudioMetrics, AudioDebugLogger, DispatchMetrics, LevelMeter
+from .command_index import command_index
+from .model_registry import (
+    model_registry,
+    MODEL_STATE_FAILED,
+    MODEL_STATE_READY,
+)
 
-    WHISPER_TYPE = "faster-whisper"
-    print("音声認識: faster-whisper を使用（最適化設定）")
-except ImportError:
-    try:
-        import whisper
-        model = whisper.load_model("base")  # 従来のWhisperモデル読み込み
-        WHISPER_TYPE = "whisper"
-        print("音声認識: whisper を使用")
-    except ImportError:
-        model = None
-        WHISPER_TYPE = None
-        print("音声認識ライブラリが見つかりません")
+# 音声認識ライブラリの判定（faster-whisper優先）
+# モデル本体はmodel_registryが初回の認識要求時にバックグラウンドで読み込む
+WHISPER_TYPE = model_registry.backend
+if WHISPER_TYPE is None:
+    print("音声認識ライブラリが見つかりません")
+else:
+    print(f"音声認識: {WHISPER_TYPE} を使用（モデルは遅延読み込み）")
 
 try:
     import pywhispercpp
@@ -49,7 +54,22 @@ except ImportError:
     print("pywhispercpp は Blender で使用できません")
 
 
-q = queue.Queue()
+# キューの上限（推論が実時間に追いつかなくてもメモリが増え続けないようにする）
+RECORDING_QUEUE_SIZE = 1000   # 5秒録音に十分なブロック数
+RESULT_QUEUE_SIZE = 8         # メインスレッドへ渡す認識結果
+TEST_QUEUE_SIZE = 8           # デバイステスト（データが来るかだけを確認）
+
+# タイマー1回で認識結果の処理に使う時間の上限（超えた分は次のタイマーに持ち越す）
+RESULT_DISPATCH_BUDGET = 0.05
+
+q = BoundedQueue(RECORDING_QUEUE_SIZE, POLICY_DROP_OLDEST)
+
+# 録音用リングバッファの容量（秒）と、固定長区間の長さ（1024サンプル×32 ≈ 2秒）
+RING_BUFFER_SECONDS = 10.0
+FIXED_WINDOW_SAMPLES = 1024 * 32
+
+# 認識前の無音除去で音声の前後に残す余白（ミリ秒）
+TRIM_MARGIN_MS = 100
 
 ######################################
 #  言語変換関数群（高速版）
@@ -113,6 +133,38 @@ def get_whisper_language_setting():
     except Exception as e:
         print(f"Whisper言語設定エラー: {e}")
         return None
+
+######################################
+#  録音・推論スレッド用の設定を公開
+######################################
+def publish_recognition_config():
+    """現在のプロパティから設定スナップショットを作り直して公開（メインスレッド専用）
+
+    プロパティのupdateコールバックと認識開始時に呼ばれる。
+    録音・推論スレッドはbpyを参照せず、get_config()で公開済みの設定を読む。
+    """
+    scene = bpy.context.scene
+    values = {"language": get_active_language()}
+    if hasattr(scene, 'bvc_device_props'):
+        props = scene.bvc_device_props
+        values.update(
+            volume_threshold=props.volume_threshold,
+            device_name=props.selected_device,
+            compute_type=props.compute_type,
+            cpu_threads=props.cpu_threads,
+        )
+    return publish_config(**values)
+    
+def request_model_load():
+    """現在の推論設定（計算精度・スレッド数）を反映してからモデルの読み込みを要求（メインスレッド専用）
+
+    設定を反映せずに読み込むと、録音開始時に設定が変わったと判定されて読み込み直しになる。
+    """
+    scene = bpy.context.scene
+    if hasattr(scene, 'bvc_device_props'):
+        props = scene.bvc_device_props
+        model_registry.configure(props.compute_type, props.cpu_threads)
+    return model_registry.request_load()
     
 ###########################################
 #   　 　　マルチスレッド音声認識管理
@@ -135,21 +187,109 @@ class VoiceRecognitionManager:
         self.initialized = True
         
         self.audio_processor = None
-        self.result_queue = queue.Queue()
+        self.inference_worker = None
+        self.window_queue = None    # 録音スレッド→推論スレッドの受け渡しキュー
+        self.result_queue = BoundedQueue(RESULT_QUEUE_SIZE, POLICY_DROP_OLDEST)
+        self.result_ready = threading.Event()  # 認識結果を入れたスレッドがセットし、メインスレッドが消す
+        self.session_id = 0  # 録音開始ごとに増える番号（停止後に終わった推論の結果を区別する）
+        self.audio_metrics = AudioMetrics()  # 録音コールバックの計測値
+        self.level_meter = LevelMeter()      # パネルの入力レベル表示
+        self.dispatch_metrics = DispatchMetrics()  # メインスレッドでの認識結果の処理
+        self.debug_logger = None             # 録音経路のデバッグログ（有効時のみ）
+        self._status_lock = threading.Lock()
+        self.status_version = 0  # 表示に影響する状態が変わるたびに増える
+        self._view_model = None  # パネル表示用の状態（status_versionが変わったときだけ作り直す）
+        self._view_key = None
+        self._clock_key = None   # 録音・推論スレッドから通知されない表示項目の前回値
         self.is_active = False
         self.current_device = None
         self.last_result = None  # 最後の認識結果を保存
         self.start_time = None   # 開始時刻
         self.status_message = "待機中"  # 状態メッセージ
     
+    ######################################
+    #  　 　　表示用の状態とバージョン
+    ######################################
+    @property
+    def status_message(self):
+        """状態メッセージ"""
+        return self._status_message
+    
+    @status_message.setter
+    def status_message(self, message):
+        if message != getattr(self, '_status_message', None):
+            self._status_message = message
+            self.bump_status()
+    
+    @property
+    def last_result(self):
+        """最後の認識結果"""
+        return self._last_result
+    
+    @last_result.setter
+    def last_result(self, result):
+        self._last_result = result
+        self.bump_status()
+    
+    def bump_status(self):
+        """表示に影響する状態が変わったことを記録（どのスレッドからも呼べる）"""
+        with self._status_lock:
+            self.status_version += 1
+    
+    def refresh_status(self):
+        """スレッドから通知されない表示項目（経過秒・モデル状態・ドライバ側の溢れ）を確認し、
+        変わっていればバージョンを進める（メインスレッドのタイマーから呼ぶ）。戻り値: 現在のバージョン
+        """
+        duration = int(time.time() - self.start_time) if self.start_time and self.is_active else 0
+        clock_key = (duration, model_registry.state, self.audio_metrics.input_overflows)
+        if clock_key != self._clock_key:
+            self._clock_key = clock_key
+            self.bump_status()
+        return self.status_version
+    
+    def get_view_model(self):
+        """パネル表示用の状態（バージョン・設定・モデル状態が変わったときだけ作り直す）"""
+        config = get_config()
+        key = (self.status_version, config.version, model_registry.state)
+        if self._view_model is None or key != self._view_key:
+            view = self.get_status_info()
+            view["language_name"] = code_to_display_name(config.language)
+            self._view_model = view
+            self._view_key = key
+        return self._view_model
+    
     def start_recognition(self, device_id=None):
         """音声認識を開始"""
         if self.is_active:
             print("音声認識は既にアクティブです")
             return True
             
-        if model is None:
-            print("音声認識モデルが利用できません")
+        # 録音・推論スレッドが参照する設定を最新にしておく
+        config = publish_recognition_config()
+        
+        # 推論設定を反映してからモデルの読み込みを要求（読み込みはバックグラウンドで行い、ここでは待たない）
+        queue_size = 2
+        queue_policy = POLICY_DROP_OLDEST
+        segment_settings = {}
+        min_speech_ms = 200
+        debug_audio_log = False
+        has_device_props = hasattr(bpy.context.scene, 'bvc_device_props')
+        if has_device_props:
+            props = bpy.context.scene.bvc_device_props
+            model_registry.configure(props.compute_type, props.cpu_threads)
+            debug_audio_log = props.debug_audio_log
+            queue_size = props.window_queue_size
+            queue_policy = props.window_queue_policy
+            min_speech_ms = props.min_speech_ms
+            segment_settings = {
+                "mode": props.segmentation_mode,
+                "threshold": props.volume_threshold,
+                "silence_ms": props.endpoint_silence_ms,
+                "max_segment_seconds": props.max_segment_seconds,
+                "pre_roll_ms": props.pre_roll_ms,
+            }
+        if model_registry.request_load() == MODEL_STATE_FAILED:
+            print(f"音声認識モデルが利用できません: {model_registry.error}")
             self.status_message = "モデル利用不可"
             return False
         
@@ -163,16 +303,48 @@ class VoiceRecognitionManager:
             self.status_message = "デバイスなし"
             return False
         
-        # オーディオプロセッサを開始
+        # デバイスのキャリブレーション結果があれば読み込む
+        profile = get_device_profile(get_device_profile_key(device_id))
+        if profile:
+            segment_settings["noise_floor"] = profile.get("noise_floor")
+            # 選択中とは別のデバイスに切り替わった場合は、そのデバイスの閾値を使う
+            # （区間の設定はデバイス設定があるときだけ作られるので、その場合に限る）
+            if has_device_props and sd.query_devices(device_id)['name'] != config.device_name:
+                segment_settings["threshold"] = profile.get("volume_threshold", segment_settings["threshold"])
+                segment_settings["pre_roll_ms"] = profile.get("pre_roll_ms", segment_settings["pre_roll_ms"])
+            print(f"デバイスプロファイルを適用: {profile.get('device_name')}")
+        
+        # 録音スレッドと推論スレッドを開始（間は上限付きキューで受け渡す）
         try:
-            self.audio_processor = AudioProcessor(self.result_queue, device_id)
+            self.audio_metrics.reset()
+            self.level_meter.reset()
+            self.dispatch_metrics.reset()
+            if debug_audio_log:
+                self.debug_logger = AudioDebugLogger(self.audio_metrics)
+                self.debug_logger.start()
+            self.window_queue = BoundedQueue(queue_size, queue_policy, coalesce=merge_audio_windows)
+            # 前回の停止時に終わりきらなかった推論の結果を持ち越さない
+            self.session_id += 1
+            self.result_queue.clear()
+            self.result_ready.clear()
+            self.inference_worker = InferenceWorker(
+                self.window_queue, self.result_queue, min_speech_ms, result_ready=self.result_ready,
+                session_id=self.session_id, pre_roll_ms=segment_settings.get("pre_roll_ms", 0)
+            )
+            self.audio_processor = AudioProcessor(
+                self.window_queue, self.result_queue, device_id, segment_settings,
+                metrics=self.audio_metrics, logger=self.debug_logger, level_meter=self.level_meter,
+                result_ready=self.result_ready, on_status_change=self.bump_status,
+                session_id=self.session_id
+            )
+            self.inference_worker.start()
             self.audio_processor.start()
             self.is_active = True
             self.current_device = device_id
             self.start_time = time.time()
             self.status_message = "録音中"
             
-            print(f"音声認識開始 (デバイス: {device_id})")
+            print(f"音声認識開始 (デバイス: {device_id}, キュー: {queue_size}/{queue_policy})")
             return True
         except Exception as e:
             print(f"音声認識開始エラー: {e}")
@@ -192,24 +364,47 @@ class VoiceRecognitionManager:
             self.audio_processor.join(timeout=2.0)
             self.audio_processor = None
         
-        # キューをクリア
-        while not self.result_queue.empty():
-            try:
-                self.result_queue.get_nowait()
-            except queue.Empty:
-                break
+        if self.inference_worker:
+            self.inference_worker.stop()
+            self.window_queue.clear()
+            self.inference_worker.join(timeout=2.0)
+            self.inference_worker = None
+        
+        if self.debug_logger:
+            self.debug_logger.stop()
+            self.debug_logger = None
+        
+        # キューをクリア（join がタイムアウトした推論の結果は、セッション番号で次回以降も捨てる）
+        self.result_queue.clear()
         
         self.status_message = "待機中"
         print("音声認識停止")
     
     def get_latest_result(self):
-        """最新の認識結果を取得"""
-        try:
-            result = self.result_queue.get_nowait()
+        """最新の認識結果を取得（停止済みのセッションの結果は捨てる）"""
+        while True:
+            try:
+                result = self.result_queue.get_nowait()
+            except queue.Empty:
+                return None
+            if result.get("session") != self.session_id:
+                print(f"停止前の認識結果を破棄: {result.get('text', result.get('error', ''))}")
+                continue
             self.last_result = result  # 最後の結果を保存
             return result
-        except queue.Empty:
-            return None
+    
+    def has_pending_work(self):
+        """まもなく認識結果が届く可能性があるか（発話中・推論待ち・推論中・未処理の結果あり）
+
+        メインスレッドのタイマーは、これがTrueの間は短い間隔で動く。
+        """
+        if self.result_ready.is_set() or not self.result_queue.empty():
+            return True
+        if self.window_queue is not None and self.window_queue.qsize():
+            return True
+        if self.inference_worker is not None and self.inference_worker.is_busy:
+            return True
+        return self.audio_processor is not None and self.audio_processor.segmenter.segment_start is not None
     
     def get_status_info(self):
         """詳細な状態情報を取得"""
@@ -220,38 +415,80 @@ class VoiceRecognitionManager:
             "last_result": self.last_result
         }
         
+        # モデルの読み込み状態
+        model_status = model_registry.get_status()
+        info["model_state"] = model_status["state"]
+        info["model_state_label"] = model_status["label"]
+        info["model_error"] = model_status["error"]
+        if self.is_active and model_status["state"] != MODEL_STATE_READY:
+            info["status_message"] = f"モデル{model_status['label']}"
+        
         if self.start_time and self.is_active:
             info["duration"] = int(time.time() - self.start_time)
         
+        # 推論待ちの区間数と、追いつかずに捨てた/結合した数
+        if self.window_queue is not None and self.is_active:
+            info["pending_windows"] = self.window_queue.qsize()
+            info["dropped_windows"] = self.window_queue.dropped_count
+            info["coalesced_windows"] = self.window_queue.coalesced_count
+        
+        # 録音コールバックの計測値（ブロック数・ドライバ側の溢れ・ピークなど）
+        if self.is_active:
+            info["audio_metrics"] = self.audio_metrics.snapshot()
+            info["audio_level"] = self.level_meter.level()
+            info["audio_peak"] = self.level_meter.peak()
+            info["audio_level_indicator"] = self.level_meter.indicator()
+            info["dispatch_metrics"] = self.dispatch_metrics.snapshot()
+        
+        # 読み出しが追いつかず上書きされた録音データと、取り出されずに捨てた認識結果
+        if self.audio_processor is not None and self.is_active:
+            info["audio_overruns"] = self.audio_processor.ring_buffer.overrun_count
+        info["dropped_results"] = self.result_queue.dropped_count
+        
+        # 認識前に削った無音と、短すぎて認識しなかった区間
+        if self.inference_worker is not None and self.is_active:
+            info["trimmed_seconds"] = self.inference_worker.trimmed_samples / 16000
+            info["skipped_short_windows"] = self.inference_worker.skipped_short_count
+        
         return info
 
 
 class AudioProcessor(threading.Thread):
-    """バックグラウンドでの音声処理"""
+    """バックグラウンドでの音声収集と区間の切り出し"""
     
-    def __init__(self, result_queue, device_id):
+    def __init__(self, window_queue, result_queue, device_id, segment_settings=None,
+                 metrics=None, logger=None, level_meter=None, result_ready=None, on_status_change=None,
+                 session_id=None):
         super().__init__(daemon=True)
+        self.window_queue = window_queue
         self.result_queue = result_queue
+        self.session_id = session_id  # 結果に付けるセッション番号
+        self.result_ready = result_ready or threading.Event()
+        self.on_status_change = on_status_change  # レベルメーターの表示が変わったときに呼ぶ
         self.device_id = device_id
-        self.audio_queue = queue.Queue()
+        self.metrics = metrics or AudioMetrics()
+        self.logger = logger  # Noneならログを出力しない
+        self.level_meter = level_meter or LevelMeter()
+        self.ring_buffer = AudioRingBuffer(RING_BUFFER_SECONDS)
+        self.segmenter = SpeechSegmenter(
+            self.ring_buffer,
+            window_samples=FIXED_WINDOW_SAMPLES,
+            **(segment_settings or {"mode": SEGMENT_MODE_FIXED})
+        )
         self.is_running = False
     
     def audio_callback(self, indata, frames, time, status):
-        """音声データのコールバック"""
+        """音声データのコールバック（リアルタイムスレッドなのでprintせず計測値だけ記録）"""
         if status:
-            print(f"オーディオステータス: {status}")
+            self.metrics.record_status(status)
+            if self.logger:
+                self.logger.log(f"オーディオステータス: {status}")
         if self.is_running:
-            if hasattr(bpy.context.scene, 'bvc_device_props'):
-                props = bpy.context.scene.bvc_device_props
-                volume_threshold = props.volume_threshold
-                # 音声データの音量レベルを簡単チェック
-                volume_level = np.max(np.abs(indata))
-                if volume_level > volume_threshold:  # 有効な音声がある場合
-                    print("♪", end="", flush=True)  # 音声検出マーク
-                else:
-                    print("_", end="", flush=True)   # 無音マーク
-                
-                self.audio_queue.put(indata.copy())
+            # 設定はメインスレッドが公開したスナップショットを読む（コールバック内でbpyに触れない）
+            self.metrics.record_block(indata, get_config().volume_threshold)
+            
+            # 確保済みのリングバッファへ直接書き込む（ブロックごとの確保なし）
+            self.ring_buffer.write(indata)
         
     def run(self):
         """メインの音声処理ループ"""
@@ -263,6 +500,13 @@ class AudioProcessor(threading.Thread):
             if self.device_id >= len(devices) or devices[self.device_id]['max_input_channels'] == 0:
                 raise Exception(f"デバイス {self.device_id} は無効または入力チャンネルがありません")
             
+            # モデルの読み込み完了を待ってから録音を開始（待機中に音声を溜め込まない）
+            while self.is_running and not model_registry.wait_until_ready(timeout=0.1):
+                if model_registry.state == MODEL_STATE_FAILED:
+                    raise Exception(f"音声認識モデルの読み込みに失敗しました: {model_registry.error}")
+            if not self.is_running:
+                return
+            
             with sd.InputStream(
                 callback=self.audio_callback,
                 channels=1,
@@ -272,31 +516,38 @@ class AudioProcessor(threading.Thread):
             ):
                 print(f"音声入力開始 (デバイス: {self.device_id} - {devices[self.device_id]['name']})")
                 
+                config_version = get_config().version
+                level_step = self.level_meter.step()
                 while self.is_running:
-                    # 音声データを蓄積してから認識
-                    audio_chunks = []
-                    chunk_count = 0
+                    if not self.ring_buffer.wait(timeout=0.1):
+                        continue
                     
-                    print("音声収集中...", end="", flush=True)
+                    # 入力レベルは一定間隔で直近のサンプルだけから計算（コールバックの負荷を増やさない）
+                    now = time.time()
+                    if self.level_meter.due(now):
+                        end = self.ring_buffer.write_position
+                        self.level_meter.update(
+                            self.ring_buffer.get_range(end - self.level_meter.window_samples, end), now
+                        )
+                        # 表示上の段階が変わったときだけパネルの再描画対象にする
+                        if self.level_meter.step() != level_step:
+                            level_step = self.level_meter.step()
+                            if self.on_status_change:
+                                self.on_status_change()
                     
-                    # 約2秒分のデータを蓄積
-                    while chunk_count < 32 and self.is_running:  # 32 chunks ≈ 2秒
-                        try:
-                            chunk = self.audio_queue.get(timeout=0.1)
-                            audio_chunks.append(chunk)
-                            chunk_count += 1
-                            
-                            # プログレス表示（8チャンクごと）
-                            if chunk_count % 8 == 0:
-                                print("●", end="", flush=True)
-                                
-                        except queue.Empty:
-                            print(".", end="", flush=True)  # 待機中を表示
-                            continue
+                    # 録音中に閾値が変更されたら区間の判定にも反映する
+                    config = get_config()
+                    if config.version != config_version:
+                        config_version = config.version
+                        self.segmenter.vad.min_level = config.volume_threshold
                     
-                    if audio_chunks and self.is_running:
-                        print(" [完了] ", end="", flush=True)
-                        self.process_audio_chunks(audio_chunks)
+                    # 固定長（約2秒）または発話の終わりで区間を切り出す（区間ごとにコピーは1回）
+                    for segment in self.segmenter.process():
+                        if not self.is_running:
+                            break
+                        if self.logger:
+                            self.logger.log(f"区間を確定: {len(segment) / 16000:.2f}秒")
+                        self.submit_window(segment)
                         
         except Exception as e:
             error_msg = str(e)
@@ -314,62 +565,131 @@ class AudioProcessor(threading.Thread):
                 print("  1. Windowsプライバシー設定でマイクアクセスを許可してください")
                 print("  2. 管理者権限でBlenderを実行してみてください")
             
-            self.result_queue.put({"error": error_msg, "suggestions": "デバイス接続とアクセス権限を確認してください"})
+            self.result_queue.offer({
+                "error": error_msg,
+                "suggestions": "デバイス接続とアクセス権限を確認してください",
+                "session": self.session_id,
+            })
+            self.result_ready.set()
         
         print("音声処理スレッド終了")
     
-    def process_audio_chunks(self, audio_chunks):
-        """音声チャンクを認識処理"""
+    def submit_window(self, audio):
+        """切り出した区間を推論スレッドに渡す（推論の完了は待たない）"""
+        window = {
+            "audio": audio,
+            "captured_at": time.time(),
+            "noise_floor": self.segmenter.vad.noise_floor,  # 無音除去の判定に使う
+        }
+        # BLOCKポリシーでも停止要求には反応できるよう短い間隔で再試行
+        while self.is_running:
+            if self.window_queue.offer(window, timeout=0.1):
+                return
+    
+    def stop(self):
+        """スレッドの停止"""
+        self.is_running = False
+
+
+class InferenceWorker(threading.Thread):
+    """推論待ちの区間を順に認識するスレッド"""
+    
+    def __init__(self, window_queue, result_queue, min_speech_ms=200, result_ready=None, session_id=None,
+                 pre_roll_ms=0):
+        super().__init__(daemon=True)
+        self.window_queue = window_queue
+        self.result_queue = result_queue
+        self.session_id = session_id  # 結果に付けるセッション番号
+        self.result_ready = result_ready or threading.Event()  # 結果を入れたらメインスレッドに知らせる
+        self.is_busy = False            # 区間を認識している最中か
+        self.min_speech_samples = int(16000 * min_speech_ms / 1000)
+        self.pre_roll_ms = pre_roll_ms  # 無音除去でも先頭に残す長さ（区間の切り出しのプリロール）
+        self.trimmed_samples = 0        # 無音除去で削ったサンプル数の累計
+        self.skipped_short_count = 0    # 音声が短すぎて認識しなかった区間の数
+        self.is_running = False
+    
+    def run(self):
+        """推論ループ"""
+        self.is_running = True
+        while self.is_running:
+            try:
+                window = self.window_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.is_busy = True
+            try:
+                self.process_audio_window(window["audio"], window["captured_at"], window["noise_floor"])
+            finally:
+                self.is_busy = False
+        print("推論スレッド終了")
+    
+    def process_audio_window(self, audio, captured_at, noise_floor=None):
+        """切り出した音声区間を認識処理"""
         try:
             print("音声データ処理開始...", end="", flush=True)
             
-            # チャンクを結合
-            audio = np.concatenate(audio_chunks, axis=0).flatten()
+            model = model_registry.get_model()
+            if model is None:
+                print(" [認識モデル未準備]")
+                return
             
-            if hasattr(bpy.context.scene, 'bvc_device_props'):
-                props = bpy.context.scene.bvc_device_props
-                volume_threshold = props.volume_threshold
-                # 音声レベルチェック（無音判定）
-                if np.max(np.abs(audio)) < volume_threshold:
-                    print(" [無音でスキップ]")
-                    return  # 無音の場合はスキップ
-                
-                # faster-whisper または whisper で認識
-                if WHISPER_TYPE == "faster-whisper":
-                    
-                    # 選択された言語設定を取得
-                    language_setting = get_whisper_language_setting()
-                    print(f"使用言語: {language_setting}")
-                    
-                    segments, info = model.transcribe(
-                        audio,
-                        language=get_active_language(),  # 動的言語設定
-                        beam_size=5,
-                        best_of=5,
-                        temperature=0.0,
-                        vad_filter=False,  # VADフィルターを無効化（onnxruntime不要）
-                    )
-                    text = "".join([segment.text for segment in segments]).strip()
+            # 設定はメインスレッドが公開したスナップショットを読む（推論スレッドからbpyに触れない）
+            config = get_config()
+            volume_threshold = config.volume_threshold
+            # 前後の無音を削除（推論コストは渡す音声の長さに比例するため）
+            audio, voiced_samples, leading, trailing = trim_silence(
+                audio, volume_threshold, noise_floor, margin_ms=TRIM_MARGIN_MS,
+                leading_margin_ms=self.pre_roll_ms
+            )
+            self.trimmed_samples += leading + trailing
+            if voiced_samples == 0:
+                print(" [無音でスキップ]")
+                return  # 無音の場合はスキップ
+            if voiced_samples < self.min_speech_samples:
+                self.skipped_short_count += 1
+                print(" [音声が短いためスキップ]")
+                return
+            
+            # faster-whisper または whisper で認識
+            if WHISPER_TYPE == "faster-whisper":
                 
-                elif WHISPER_TYPE == "whisper":
-                    result = model.transcribe(audio, language="ja")
-                    text = result["text"].strip()
-                else:
-                    print(" [認識モデル無効]")
-                    return
+                print(f"使用言語: {config.language}")
                 
-                # 結果をキューに送信
-                if text:
-                    print(f"認識結果: {text}")
-                    self.result_queue.put({
-                        "text": text,
-                        "timestamp": time.time(),
-                        "confidence": getattr(info, 'language_probability', 1.0) if WHISPER_TYPE == "faster-whisper" else 1.0
-                    })
-                else:
-                    print(" [認識結果なし]")
+                segments, info = model.transcribe(
+                    audio,
+                    language=config.language,  # 動的言語設定
+                    beam_size=config.beam_size,
+                    best_of=config.best_of,
+                    temperature=config.temperature,
+                    vad_filter=False,  # VADフィルターを無効化（onnxruntime不要）
+                )
+                text = "".join([segment.text for segment in segments]).strip()
+            
+            elif WHISPER_TYPE == "whisper":
+                result = model.transcribe(audio, language="ja")
+                text = result["text"].strip()
             else:
-                print(" [プロパティ取得エラー]")
+                print(" [認識モデル無効]")
+                return
+            
+            # 停止を要求された後に終わった推論の結果は送らない
+            if not self.is_running:
+                print(f" [停止済みのため破棄: {text}]")
+                return
+            
+            # 結果をキューに送信
+            if text:
+                print(f"認識結果: {text}")
+                self.result_queue.offer({
+                    "text": text,
+                    "session": self.session_id,
+                    "timestamp": time.time(),
+                    "latency": time.time() - captured_at,  # 区間の確定から結果までの時間
+                    "confidence": getattr(info, 'language_probability', 1.0) if WHISPER_TYPE == "faster-whisper" else 1.0
+                })
+                self.result_ready.set()
+            else:
+                print(" [認識結果なし]")
         
         except Exception as e:
             print(f"音声認識エラー: {e}")
@@ -379,6 +699,7 @@ class AudioProcessor(threading.Thread):
         """スレッドの停止"""
         self.is_running = False
 
+
 # グローバルインスタンス
 # VoiceRecognitionManagerクラスのインスタンスを作成して、モジュール全体で共有できるグローバル変数
 voice_manager = VoiceRecognitionManager()
@@ -498,10 +819,10 @@ def test_audio_device(device_id):
     """選択されたデバイスでテスト録音を実行"""
     try:
         print(f"デバイス {device_id} をテスト中...")
-        test_queue = queue.Queue()
+        test_queue = BoundedQueue(TEST_QUEUE_SIZE, POLICY_DROP_NEWEST)
         
         def test_callback(indata, frames, time, status):
-            test_queue.put(indata.copy())
+            test_queue.offer(indata.copy())
         
         # 短時間のテスト録音
         with sd.InputStream(
@@ -525,12 +846,70 @@ def test_audio_device(device_id):
         print(f"デバイステストエラー: {e}")
         return False
 
+########################################
+#  　 　　短時間の録音（自動計測・キャリブレーション用）
+########################################
+def record_audio_clip(device_id, seconds=5.0):
+    """指定デバイスで短時間録音してfloat32配列を返す（録音中はブロック）"""
+    print(f"録音中... ({seconds}秒間)")
+    audio = sd.rec(
+        int(seconds * 16000),
+        samplerate=16000,
+        channels=1,
+        dtype='float32',
+        device=device_id
+    )
+    sd.wait()
+    return audio.flatten()
+
+CLIP_LEAD_IN_SECONDS = 0.5  # 案内を表示してから録音を始めるまでの時間
+
+class ClipRecorder(threading.Thread):
+    """短時間の録音をバックグラウンドで行う（メインスレッドは完了をタイマーで確認する）"""
+    
+    def __init__(self, device_id, seconds, lead_in=CLIP_LEAD_IN_SECONDS):
+        super().__init__(daemon=True)
+        self.device_id = device_id
+        self.seconds = seconds
+        self.lead_in = lead_in
+        self.audio = None   # 録音結果（float32配列）
+        self.error = None   # 失敗した場合のエラーメッセージ
+    
+    def run(self):
+        try:
+            # 案内が画面に表示されるまで待ってから録音する
+            time.sleep(self.lead_in)
+            self.audio = record_audio_clip(self.device_id, self.seconds)
+        except Exception as e:
+            self.error = str(e)
+
+def resolve_input_device_id():
+    """選択中のデバイス（なければ既定の入力デバイス）のIDをテスト録音なしで取得"""
+    scene = bpy.context.scene
+    if hasattr(scene, 'bvc_device_props') and scene.bvc_device_props.selected_device != "未選択":
+        device_id = find_input_device_id(scene.bvc_device_props.selected_device)
+        if device_id is not None:
+            return device_id
+    try:
+        return find_input_device_id(sd.query_devices(kind='input')['name'])
+    except Exception as e:
+        print(f"既定の入力デバイスを取得できません: {e}")
+        return None
+
 
-def callback(indata, frames, time, status):
-    if status:
-        print("Status:", status)
-    print("音声データ:", indata.shape)
-    q.put(indata.copy())
+# 音声識別テスト（VOICE_OT_speech_recognition）の録音コールバックの計測値
+recording_metrics = AudioMetrics()
+
+def make_recording_callback(metrics, logger=None):
+    """音声識別テスト用の録音コールバックを作成（リアルタイムスレッドなのでprintせず計測値だけ記録）"""
+    def callback(indata, frames, time, status):
+        if status:
+            metrics.record_status(status)
+            if logger:
+                logger.log(f"オーディオステータス: {status}")
+        metrics.record_block(indata, get_config().volume_threshold)
+        q.offer(indata.copy())
+    return callback
 
 def recognize_from_queue():
     """音声認識を実行する関数（faster-whisper と whisper の両方に対応）"""
@@ -542,7 +921,9 @@ def recognize_from_queue():
         print("音声データがありません")
         return None
         
+    model = model_registry.get_model()
     if model is None:
+        request_model_load()
         print("音声認識モデルが利用できません")
         return "音声認識テスト"
     
@@ -584,6 +965,22 @@ def recognize_from_queue():
 
 
 
+######################################
+#  　 　　デバイスプロファイルのキー
+######################################
+def get_device_profile_key(device_id):
+    """デバイスIDからプロファイルのキー（ホストAPI:デバイス名）を取得"""
+    device = sd.query_devices(device_id)
+    hostapi_name = sd.query_hostapis(device['hostapi'])['name']
+    return device_profile_key(device['name'], hostapi_name)
+
+def find_input_device_id(device_name):
+    """デバイス名から入力デバイスのIDを検索（見つからなければNone）"""
+    for i, device in enumerate(sd.query_devices()):
+        if device['name'] == device_name and device['max_input_channels'] > 0:
+            return i
+    return None
+
 ######################################
 #  　 　　マイクデバイスの取得
 ######################################
@@ -785,6 +1182,7 @@ def load_commands_from_json():
                         # code属性が存在する場合のみセット
                         if hasattr(cmd_item, "command_code"):
                             cmd_item.command_code = str(cmd_val.get("code", ""))
+                        cmd_item.command_priority = int(cmd_val.get("priority", 0))
                     else:
                         # 旧形式: 文字列のみ
                         cmd_item.command_description = str(cmd_val)
@@ -794,6 +1192,10 @@ def load_commands_from_json():
                 print(f"言語 '{lang_name}' の追加中にエラー: {e}")
                 continue
                 
+        # 照合用インデックスも読み込んだファイルから作り直す（編集中の内容を破棄）
+        command_index.invalidate()
+        command_index.ensure_current()
+        
         print(f"JSONから{len(command_props.language_commands)}言語のコマンドを読み込みました")
         return True
         
@@ -834,6 +1236,10 @@ def sync_command_items_to_bvc_props():
                     new_cmd.command_key = item.name
                     new_cmd.command_description = item.description
                     new_cmd.command_code = item.code
+                    new_cmd.command_priority = item.priority
+                
+                # 照合用インデックスにも編集内容を反映（保存前でも音声コマンドで使えるように）
+                command_index.load_data(collect_command_data(command_props))
                 
                 print(f"【{current_language}】に {len(scene.command_items)} 個のコマンドを同期しました")
                 return True
@@ -845,6 +1251,26 @@ def sync_command_items_to_bvc_props():
         print(f"同期エラー: {e}")
         return False
 
+######################################
+#  　 　　PropertyからJSON形式のデータを構築
+######################################
+def collect_command_data(command_props):
+    """language_commandsをcommand.jsonと同じ形式の辞書に変換"""
+    json_data = {}
+    for lang_items in command_props.language_commands:
+        lang_data = {}
+        for cmd_item in lang_items.commands:
+            cmd_data = {
+                "description": cmd_item.command_description,
+                "code": cmd_item.command_code
+            }
+            # 優先度は指定があるコマンドだけ書き出す（省略時は0）
+            if cmd_item.command_priority:
+                cmd_data["priority"] = cmd_item.command_priority
+            lang_data[cmd_item.command_key] = cmd_data
+        json_data[lang_items.language_name] = lang_data
+    return json_data
+
 ######################################
 #  　 　　Propertyからjsonファイルに音声コマンドを保存
 ######################################
@@ -868,20 +1294,8 @@ def save_commands_to_json():
             return False
         
         # PropertyからJSONデータを構築
-        json_data = {}
         try:
-            for lang_items in command_props.language_commands:
-                print(f"lang_item : {lang_items}")
-                lang_data = {}
-                for cmd_item in lang_items.commands:
-                    print(f"cmd_item : {cmd_item}")
-                    lang_data[cmd_item.command_key] = {
-                        "description": cmd_item.command_description,
-                        "code": cmd_item.command_code
-                        #"code": getattr(cmd_item, "code", "")
-                    }
-                json_data[lang_items.language_name] = lang_data
-                
+            json_data = collect_command_data(command_props)
         except Exception as e:
             print(f"データ構築エラー: {e}")
             print("error3")
@@ -894,6 +1308,9 @@ def save_commands_to_json():
         with open(json_path, 'w', encoding='utf-8') as file:
             json.dump(json_data, file, ensure_ascii=False, indent=2)
             
+        # 保存したファイルから照合用インデックスを作り直す
+        command_index.invalidate()
+        
         print(f"JSONに{len(json_data)}言語のコマンドを保存しました")
         return True
         
@@ -916,8 +1333,9 @@ class PyWhisperCppStreamingManager:
         self.model = None
         self.streaming = None
         self.is_running = False
-        self.audio_queue = queue.Queue()
-        self.result_queue = queue.Queue()
+        self.ring_buffer = AudioRingBuffer(RING_BUFFER_SECONDS)
+        self.result_queue = BoundedQueue(RESULT_QUEUE_SIZE, POLICY_DROP_OLDEST)
+        self.metrics = AudioMetrics()  # 音声入力コールバックの計測値
         self.stream_thread = None
         self.audio_thread = None
         
@@ -948,16 +1366,26 @@ class PyWhisperCppStreamingManager:
             return False
     
     def audio_callback(self, indata, frames, time, status):
-        """音声入力コールバック"""
+        """音声入力コールバック（printせず計測値だけ記録）"""
         if status:
-            print(f"音声入力エラー: {status}")
-        
-        # float32をint16に変換（pywhispercppが期待する形式）
-        audio_data = (indata.flatten() * 32767).astype(np.int16)
+            self.metrics.record_status(status)
+        self.metrics.record_block(indata, get_config().volume_threshold)
         
-        # キューに音声データを追加
-        if not self.audio_queue.full():
-            self.audio_queue.put(audio_data)
+        # float32のままリングバッファに書き込む（int16への変換は認識直前に1回だけ行う）
+        self.ring_buffer.write(indata)
+    
+    def read_block(self, timeout=1.0):
+        """未読の音声を1ブロック分読み出す（なければNone）"""
+        if self.ring_buffer.available() < self.chunk_size:
+            self.ring_buffer.wait(timeout)
+            if self.ring_buffer.available() < self.chunk_size:
+                return None
+        return self.ring_buffer.read(self.chunk_size)
+    
+    @staticmethod
+    def to_int16(audio):
+        """float32をint16に変換（pywhispercppが期待する形式）"""
+        return (audio * 32767).astype(np.int16)
     
     def streaming_worker(self):
         """ストリーミング処理ワーカー"""
@@ -966,31 +1394,31 @@ class PyWhisperCppStreamingManager:
         while self.is_running:
             try:
                 # 音声データを取得（タイムアウト付き）
-                audio_chunk = self.audio_queue.get(timeout=1.0)
+                audio_chunk = self.read_block(timeout=1.0)
+                if audio_chunk is None:
+                    continue
                 
                 # ストリーミング認識実行
                 if self.streaming:
-                    result = self.streaming.process_audio(audio_chunk)
+                    result = self.streaming.process_audio(self.to_int16(audio_chunk))
                     
                     if result and result.strip():
                         # 結果をキューに追加
-                        self.result_queue.put({
+                        self.result_queue.offer({
                             "text": result,
                             "timestamp": time.time(),
                             "is_final": True  # pywhispercppでは基本的に最終結果
                         })
                         print(f"\n認識結果: {result}")
                 
-            except queue.Empty:
-                continue
             except Exception as e:
                 print(f"ストリーミング処理エラー: {e}")
                 break
         
         print("ストリーミング処理終了")
     
-    def start_streaming(self, device_id=None):
-        """ストリーミング開始"""
+    def start_streaming(self, device_id=None, worker=None):
+        """ストリーミング開始（リングバッファの読み出し側は1スレッドのみ）"""
         if self.is_running:
             print("ストリーミングは既に実行中です")
             return False
@@ -1000,6 +1428,7 @@ class PyWhisperCppStreamingManager:
             return False
         
         try:
+            self.metrics.reset()
             # 音声入力ストリームを開始
             self.stream = sd.InputStream(
                 device=device_id,
@@ -1014,7 +1443,7 @@ class PyWhisperCppStreamingManager:
             self.is_running = True
             
             # ストリーミング処理スレッドを開始
-            self.stream_thread = threading.Thread(target=self.streaming_worker)
+            self.stream_thread = threading.Thread(target=worker or self.streaming_worker)
             self.stream_thread.daemon = True
             self.stream_thread.start()
             
@@ -1041,12 +1470,8 @@ class PyWhisperCppStreamingManager:
         if self.stream_thread and self.stream_thread.is_alive():
             self.stream_thread.join(timeout=2.0)
         
-        # キューをクリア
-        while not self.audio_queue.empty():
-            try:
-                self.audio_queue.get_nowait()
-            except queue.Empty:
-                break
+        # 未読の音声を破棄
+        self.ring_buffer.reset()
         
         print("pywhispercpp ストリーミング停止")
     
@@ -1071,15 +1496,17 @@ class AdvancedPyWhisperCppStreaming(PyWhisperCppStreamingManager):
     
     def __init__(self):
         super().__init__()
-        self.audio_buffer = []
+        self.speech_start = None      # 発話区間の開始位置（リングバッファの累計位置）
         self.buffer_size = 16000 * 3  # 3秒分のバッファ
+        self.pre_roll_samples = int(16000 * 0.3)  # 発話開始の直前に含める長さ（子音の欠け防止）
         self.silence_threshold = 0.01
         self.min_speech_duration = 0.5  # 最小音声長（秒）
+        # faster-whisper経路と同じフレーム単位のVAD（1024サンプルのブロックを4フレームで判定）
+        self.vad = FrameVAD(sample_rate=self.sample_rate, min_level=self.silence_threshold)
         
     def is_speech(self, audio_chunk):
-        """音声かどうかを判定（簡単なVAD）"""
-        volume = np.sqrt(np.mean(audio_chunk**2))
-        return volume > self.silence_threshold
+        """音声かどうかを判定（フレーム単位のVADで、ブロック内に音声フレームがあるか）"""
+        return bool(self.vad.process(audio_chunk).any())
     
     def streaming_worker_with_vad(self):
         """VAD付きストリーミング処理"""
@@ -1087,28 +1514,38 @@ class AdvancedPyWhisperCppStreaming(PyWhisperCppStreamingManager):
         
         while self.is_running:
             try:
-                audio_chunk = self.audio_queue.get(timeout=1.0)
+                audio_chunk = self.read_block(timeout=1.0)
+                if audio_chunk is None:
+                    continue
+                chunk_end = self.ring_buffer.read_position
                 
                 # VADチェック
                 if self.is_speech(audio_chunk):
-                    # 音声を検出した場合、バッファに追加
-                    self.audio_buffer.extend(audio_chunk)
+                    # 音声を検出した場合、発話区間の開始位置だけを記録（データはリングバッファに残る）
+                    # 閾値を超える前のプリロール分も区間に含める
+                    if self.speech_start is None:
+                        self.speech_start = max(
+                            chunk_end - len(audio_chunk) - self.pre_roll_samples,
+                            self.ring_buffer.oldest_position()
+                        )
                     
                     # バッファサイズを制限
-                    if len(self.audio_buffer) > self.buffer_size:
-                        self.audio_buffer = self.audio_buffer[-self.buffer_size:]
+                    self.speech_start = max(self.speech_start, chunk_end - self.buffer_size)
                 
                 else:
-                    # 無音の場合、バッファに音声があれば処理
-                    if len(self.audio_buffer) > self.sample_rate * self.min_speech_duration:
-                        # 音声認識実行
-                        audio_array = np.array(self.audio_buffer, dtype=np.int16)
+                    # 無音の場合、発話区間があれば処理
+                    speech_length = 0 if self.speech_start is None else chunk_end - len(audio_chunk) - self.speech_start
+                    if speech_length > self.sample_rate * self.min_speech_duration:
+                        # 音声認識実行（区間をまとめて1回だけコピー・変換）
+                        audio_array = self.to_int16(
+                            self.ring_buffer.get_range(self.speech_start, chunk_end - len(audio_chunk))
+                        )
                         
                         if self.streaming:
                             result = self.streaming.process_audio(audio_array)
                             
                             if result and result.strip():
-                                self.result_queue.put({
+                                self.result_queue.offer({
                                     "text": result,
                                     "timestamp": time.time(),
                                     "is_final": True,
@@ -1116,11 +1553,9 @@ class AdvancedPyWhisperCppStreaming(PyWhisperCppStreamingManager):
                                 })
                                 print(f"VAD認識結果: {result}")
                     
-                    # バッファをクリア
-                    self.audio_buffer = []
+                    # 発話区間をリセット
+                    self.speech_start = None
                 
-            except queue.Empty:
-                continue
             except Exception as e:
                 print(f"VADストリーミング処理エラー: {e}")
                 break
@@ -1129,15 +1564,10 @@ class AdvancedPyWhisperCppStreaming(PyWhisperCppStreamingManager):
     
     def start_streaming_with_vad(self, device_id=None):
         """VAD付きストリーミング開始"""
-        if self.start_streaming(device_id):
-            # 通常のワーカーを停止してVADワーカーに置き換え
-            if self.stream_thread:
-                self.stream_thread.join(timeout=1.0)
-            
-            self.stream_thread = threading.Thread(target=self.streaming_worker_with_vad)
-            self.stream_thread.daemon = True
-            self.stream_thread.start()
-            
+        # 通常のワーカーの代わりにVADワーカーで読み出す
+        self.speech_start = None
+        self.vad.reset()
+        if self.start_streaming(device_id, worker=self.streaming_worker_with_vad):
             print("VAD付きストリーミング開始")
             return True
         return False
@@ -1175,18 +1605,3 @@ def get_realtime_results():
     if pywhisper_streaming_manager:
         return pywhisper_streaming_manager.get_latest_result()
     return []
-
-######################################
-#  　 　　カタカナ変換
-######################################
-def to_katakana(text):
-    t = Tokenizer()
-    result = ''
-    for token in t.tokenize(text):
-        # token.reading が読み（カナ）を返す
-        reading = token.reading
-        if reading == '*':  # 読み情報がない場合はそのまま
-            result += token.surface
-        else:
-            result += reading
-    return result
\ No newline at end of file
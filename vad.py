@@ -0,0 +1,132 @@
+"""
+フレーム単位の音声区間検出（VAD）
+faster-whisper・pywhispercppの両方の経路で共有する
+"""
+import numpy as np
+
+DEFAULT_FRAME_SAMPLES = 256  # 16kHzで16ms（1024サンプルのブロックを4分割できる長さ）
+
+
+def frame_features(audio, frame_samples):
+    """フレームごとのエネルギー・ピーク・ゼロ交差率をまとめて計算
+
+    端数のサンプルは無視する（呼び出し側でフレーム長の倍数を渡す）。
+    """
+    count = len(audio) // frame_samples
+    frames = audio[:count * frame_samples].reshape(count, frame_samples)
+    energy = np.mean(np.square(frames), axis=1)
+    peak = np.max(np.abs(frames), axis=1)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_samples - 1)
+    return energy, peak, zcr
+
+
+###########################################
+#   　 　　適応ノイズフロア付きVAD
+###########################################
+class FrameVAD:
+    """エネルギー＋ゼロ交差率による音声区間検出
+
+    ノイズフロアは無音フレームのエネルギーを指数移動平均で追従し、
+    開始（onset）と終了（offset）で異なる比率を使うヒステリシスと、
+    終了後もしばらく音声とみなすハングオーバーで判定を安定させる。
+    """
+
+    def __init__(self, sample_rate=16000, frame_samples=DEFAULT_FRAME_SAMPLES, min_level=0.0,
+                 onset_ratio=4.0, offset_ratio=2.0, onset_frames=3, hangover_ms=300,
+                 noise_alpha=0.05, zcr_max=0.4, initial_noise=1e-6):
+        self.sample_rate = sample_rate
+        self.frame_samples = frame_samples
+        self.frame_ms = 1000.0 * frame_samples / sample_rate
+        self.min_level = min_level          # フレームのピークがこれ未満なら音声としない
+        self.onset_ratio = onset_ratio      # 開始判定: エネルギー > ノイズフロア × onset_ratio
+        self.offset_ratio = offset_ratio    # 継続判定: エネルギー > ノイズフロア × offset_ratio
+        self.onset_frames = onset_frames    # 開始とみなす連続フレーム数（クリック音を除外）
+        self.hangover_frames = max(1, int(round(hangover_ms / self.frame_ms)))
+        self.noise_alpha = noise_alpha
+        self.zcr_max = zcr_max              # これを超える低エネルギーのフレームは雑音とみなす
+
+        self.noise_floor = initial_noise
+        self.in_speech = False
+        self._onset_run = 0
+        self._hangover = 0
+
+    def process(self, audio):
+        """音声をフレームに分けて判定し、フレームごとの音声フラグ（bool配列）を返す"""
+        energy, peak, zcr = frame_features(audio, self.frame_samples)
+        flags = np.zeros(len(energy), dtype=bool)
+        if len(energy) == 0:
+            return flags
+
+        # 特徴量の比較はまとめて計算し、状態遷移だけをフレームごとに進める
+        loud = peak >= self.min_level
+        tonal = zcr <= self.zcr_max
+        for i in range(len(energy)):
+            noise = self.noise_floor
+            if not self.in_speech:
+                onset = loud[i] and energy[i] > noise * self.onset_ratio and (
+                    tonal[i] or energy[i] > noise * self.onset_ratio * 16
+                )
+                if onset:
+                    self._onset_run += 1
+                    if self._onset_run >= self.onset_frames:
+                        self.in_speech = True
+                        self._hangover = self.hangover_frames
+                        flags[max(0, i - self._onset_run + 1):i + 1] = True
+                else:
+                    self._onset_run = 0
+                    # 無音フレームでノイズフロアを更新
+                    self.noise_floor = noise + self.noise_alpha * (energy[i] - noise)
+            else:
+                if loud[i] and energy[i] > noise * self.offset_ratio:
+                    self._hangover = self.hangover_frames
+                else:
+                    self._hangover -= 1
+                    if self._hangover <= 0:
+                        self.in_speech = False
+                        self._onset_run = 0
+                flags[i] = self.in_speech
+                # 発話中も非常にゆっくり追従し、大きな定常雑音で判定が張り付かないようにする
+                self.noise_floor = noise + self.noise_alpha * 0.02 * (energy[i] - noise)
+            self.noise_floor = max(self.noise_floor, 1e-9)
+        return flags
+
+    def reset(self, noise_floor=None):
+        """判定状態を初期化（ノイズフロアを指定した場合はその値から開始）"""
+        if noise_floor is not None:
+            self.noise_floor = noise_floor
+        self.in_speech = False
+        self._onset_run = 0
+        self._hangover = 0
+
+
+######################################
+#  　 　　前後の無音の除去
+######################################
+def trim_silence(audio, threshold, noise_floor=None, sample_rate=16000,
+                 frame_samples=DEFAULT_FRAME_SAMPLES, margin_ms=100, noise_ratio=2.0,
+                 leading_margin_ms=None):
+    """区間の前後の無音フレームを削除（音声の前後にmargin_msだけ余白を残す）
+
+    音声フレームはピークが閾値以上のフレームなので、閾値に届かない語頭の子音（摩擦音など）は
+    無音として扱われる。先頭にはleading_margin_ms（プリロールの長さを渡す）とmargin_msの
+    長い方を残し、区間の切り出しで含めたプリロールを削らないようにする。
+    戻り値: (削除後の音声, 音声フレームの長さ[サンプル], 先頭の削除数, 末尾の削除数)
+    音声フレームがなければ音声フレームの長さは0になる。
+    """
+    energy, peak, _ = frame_features(audio, frame_samples)
+    voiced = peak >= threshold
+    if noise_floor:
+        voiced &= energy > noise_floor * noise_ratio
+
+    indices = np.flatnonzero(voiced)
+    if len(indices) == 0:
+        return audio[:0], 0, len(audio), 0
+
+    voiced_start = indices[0] * frame_samples
+    voiced_end = (indices[-1] + 1) * frame_samples
+    margin = int(sample_rate * margin_ms / 1000)
+    leading_margin = max(margin, int(sample_rate * (leading_margin_ms or 0) / 1000))
+    start = max(0, voiced_start - leading_margin)
+    end = min(len(audio), voiced_end + margin)
+    return audio[start:end], voiced_end - voiced_start, start, len(audio) - end